@@ -0,0 +1,90 @@
+'''Simple Chess Analysis Module
+
+Runs engine searches in a pool of worker processes so that the tkinter main loop never waits for them.
+Positions are sent as Board snapshots and the result of every completed iteration is streamed back through a queue
+which the GUI polls with root.after; starting a new analysis cancels the current one'''
+
+import concurrent.futures
+import multiprocessing
+import queue
+
+from board import Board
+from instrumentation import get_logger
+import engine
+
+log = get_logger(__name__)
+
+POLL_INTERVAL = 16 # Milliseconds between two polls of the updates (about 60 per second)
+
+def _analyse(job, snapshot, time_limit, depth, updates, stop):
+    'Worker process entry point; searches the position of a board snapshot and puts (job, final, result fields) tuples on updates'
+
+    def report(result, final=False):
+        updates.put((job, final, result.move, result.score, result.depth, result.nodes, result.elapsed))
+
+    result = engine.search(Board.from_snapshot(snapshot).to_position(), time_limit, depth, info=report, stop=stop)
+    report(result, True)
+
+class AnalysisPool:
+    'Pool of worker processes searching positions in the background'
+
+    __slots__ = ('executor', 'manager', 'updates', 'job', 'stop', 'future')
+
+    def __init__(self, workers=None):
+        self.executor = concurrent.futures.ProcessPoolExecutor(workers) # Worker processes are started on the first analysis
+        self.manager = multiprocessing.Manager() # Shares the update queue and the cancel events with the workers
+        self.updates = self.manager.Queue() # Updates of every analysis as (job, final, result fields)
+        self.job = 0 # Number of the current analysis, updates of older ones are dropped
+        self.stop = None # Event cancelling the current analysis, None if no analysis is running
+        self.future = None
+
+    def start(self, snapshot, time_limit=None, depth=None):
+        '''Cancels the current analysis and starts searching the position of a board snapshot; returns the job number of the new analysis
+
+        Takes Board.snapshot() of the position, seconds to search and deepest iteration (searches until cancelled if both are None)'''
+
+        self.cancel()
+        self.job += 1
+        self.stop = self.manager.Event()
+        self.future = self.executor.submit(_analyse, self.job, snapshot, time_limit, depth, self.updates, self.stop)
+        log.debug('Started analysis %d (time %s, depth %s)', self.job, time_limit, depth)
+        return self.job
+
+    def cancel(self):
+        'Stops the current analysis; its updates still queued or sent afterwards are dropped by poll()'
+
+        if self.stop is not None:
+            log.debug('Cancelled analysis %d', self.job)
+            self.stop.set()
+            self.stop = self.future = None
+            self.job += 1 # No analysis has this job number until the next one is started
+
+    def poll(self):
+        '''Returns the updates of the current analysis received since the last poll without blocking
+
+        Updates are (SearchResult, final) tuples; final is True for the result of the whole search'''
+
+        if self.future is not None and self.future.done() and self.future.exception() is not None: # Worker has failed
+            self.stop = None
+            future, self.future = self.future, None
+            log.error('Analysis %d failed', self.job, exc_info=future.exception())
+            raise future.exception()
+
+        results = []
+        while True:
+            try:
+                job, final, *fields = self.updates.get_nowait()
+            except queue.Empty:
+                return results
+
+            if job == self.job: # Analysis has not been cancelled
+                results.append((engine.SearchResult(*fields), final))
+                if final:
+                    self.stop = None
+
+    def close(self):
+        'Cancels the current analysis and stops the worker processes'
+
+        self.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.manager.shutdown()
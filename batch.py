@@ -0,0 +1,257 @@
+'''Simple Chess Batch Evaluation Module
+
+Scores large sets of positions at once with vectorized NumPy operations (NumPy is only needed by this module).
+Positions are encoded as an (N, 64) int8 array of board piece codes, which is the first 64 bytes of Board.state (0 for an empty square),
+or as an (N, 12, 64) array of piece planes indexed by side*6 + piece type. Every plane is packed into one 64 bit bitboard per position,
+so attacks and mobility are computed for all positions together with shifts and occluded fills.
+
+Usage:
+    python batch.py --bench 100000            (evaluates random positions and reports positions/s)
+    python batch.py games.pgn                 (evaluates every position of a PGN archive)'''
+
+import argparse
+import random
+import sys
+import time
+
+import numpy as np # Optional dependency, the game and the engine do not need it
+
+from board import STATE_SIZE, SIDE, KNIGHT_OFFSETS, piece_code
+from movegen import Position, WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, DIRECTIONS, LINEAR_DIRECTIONS, DIAGONAL_DIRECTIONS
+from engine import SQUARE_VALUES
+
+PLANE_CODES = np.array([piece_code(side, kind) for side in (WHITE, BLACK) for kind in range(6)], dtype=np.int8) # Board piece code of every plane
+VALUE_TABLE = np.zeros((16, 64), dtype=np.int32) # Material and positional value of every piece code on every square from white's point of view
+for _side, _sign in ((WHITE, 1), (BLACK, -1)):
+    for _kind in range(6):
+        VALUE_TABLE[piece_code(_side, _kind)] = [_sign*value for value in SQUARE_VALUES[_side][_kind]]
+SQUARE_INDEXES = np.arange(64)
+
+PAWN_OFFSETS = (((-1, -1), (1, -1)), ((-1, 1), (1, 1))) # Column and row offsets attacked by a pawn of each side
+PUSH_ROWS = (0xFF << 40, 0xFF << 16) # Row a pawn of each side reaches with the first step of a double push
+
+POPCOUNT_BYTES = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8) # Set bits of every byte, used when NumPy has no bitwise_count
+
+def _column_mask(column_offset):
+    'Returns the bitboard of the squares a step of column_offset can land on without wrapping around the board'
+
+    return sum(1 << (row*8 + column) for row in range(8) for column in range(8) if 0 <= column - column_offset < 8)
+
+COLUMN_MASKS = {offset: np.uint64(_column_mask(offset)) for offset in range(-2, 3)}
+
+### ENCODING
+
+def _position_state(position):
+    'Returns the Board state bytes of a movegen Position (only the pieces and the side to move are filled in)'
+
+    return bytes(0 if code is None else code + 1 for code in position.squares) + bytes((position.side,)) + bytes(STATE_SIZE - SIDE - 1) # Position codes are board codes minus one
+
+def encode(positions):
+    '''Returns a tuple (codes, sides) for an iterable of positions: an (N, 64) int8 array of piece codes and an (N,) int8 array of sides to move
+
+    Takes Board objects (such as Piece.board kept by the GUI), Board snapshots or movegen Positions'''
+
+    rows = []
+    for position in positions:
+        if isinstance(position, Position):
+            rows.append(_position_state(position))
+        elif isinstance(position, (bytes, bytearray)):
+            rows.append(bytes(position))
+        else:
+            rows.append(bytes(position.state))
+
+    state = np.frombuffer(b''.join(rows), dtype=np.int8).reshape(len(rows), STATE_SIZE)
+    return state[:, :64], state[:, SIDE]
+
+def planes(codes):
+    'Returns the (N, 12, 64) int8 piece planes of an (N, 64) array of piece codes'
+
+    return (codes[:, None, :] == PLANE_CODES[None, :, None]).astype(np.int8)
+
+def bitboards(pieces):
+    'Returns an (N, 12) uint64 array of the bitboard of every plane of an (N, 64) array of piece codes or an (N, 12, 64) array of planes'
+
+    pieces = np.asarray(pieces)
+    if pieces.ndim == 2:
+        pieces = pieces[:, None, :] == PLANE_CODES[None, :, None]
+    packed = np.packbits(pieces.astype(bool), axis=2, bitorder='little') # Square i becomes bit i
+    return np.ascontiguousarray(packed).view('<u8')[:, :, 0]
+
+def codes_of(pieces):
+    'Returns the (N, 64) int8 piece codes of an (N, 64) array of piece codes or an (N, 12, 64) array of planes'
+
+    pieces = np.asarray(pieces)
+    if pieces.ndim == 2:
+        return pieces.astype(np.int8, copy=False)
+    return np.einsum('npq,p->nq', pieces.astype(np.int8), PLANE_CODES, dtype=np.int8)
+
+### BITBOARD OPERATIONS
+
+def popcount(bitboards):
+    'Returns the number of set bits of every element of a uint64 array'
+
+    if hasattr(np, 'bitwise_count'): # NumPy 2.0 and later
+        return np.bitwise_count(bitboards).astype(np.int32)
+    return POPCOUNT_BYTES[bitboards.view(np.uint8).reshape(*bitboards.shape, 8)].sum(-1, dtype=np.int32)
+
+def _raw_shift(bitboards, offset):
+    'Returns bitboards with every bit moved by offset squares (towards higher squares if positive)'
+
+    return bitboards << np.uint64(offset) if offset > 0 else bitboards >> np.uint64(-offset)
+
+def _shift(bitboards, column_offset, row_offset):
+    'Returns bitboards with every square moved by the given column and row offsets; squares leaving the board are dropped'
+
+    shifted = _raw_shift(bitboards, row_offset*8 + column_offset)
+    return shifted & COLUMN_MASKS[column_offset] if column_offset else shifted
+
+def _slide(sliders, empty, column_offset, row_offset):
+    'Returns the squares attacked in one direction by the sliders of every bitboard, stopping at the first occupied square (occluded fill)'
+
+    offset = row_offset*8 + column_offset
+    propagator = empty & COLUMN_MASKS[column_offset] # Squares a ray can pass through without wrapping around the board
+    for steps in (1, 2, 4): # Rays are extended by 1, 2 then 4 squares
+        sliders = sliders | propagator & _raw_shift(sliders, offset*steps)
+        propagator = propagator & _raw_shift(propagator, offset*steps)
+    return _shift(sliders, column_offset, row_offset)
+
+def attack_sets(boards, side):
+    '''Returns a list of (N,) uint64 arrays of the squares attacked by side; each piece attacks a square through at most one of them,
+    so summing their bit counts counts every attack of every piece once
+
+    Takes the (N, 12) bitboards of the positions'''
+
+    pieces = boards[:, side*6:side*6 + 6]
+    empty = ~np.bitwise_or.reduce(boards, axis=1)
+    sets = [_shift(pieces[:, PAWN], *offset) for offset in PAWN_OFFSETS[side]]
+    sets += [_shift(pieces[:, KNIGHT], *offset) for offset in KNIGHT_OFFSETS]
+    sets += [_shift(pieces[:, KING], *DIRECTIONS[direction]) for direction in range(8)]
+
+    for directions, kind in ((LINEAR_DIRECTIONS, ROOK), (DIAGONAL_DIRECTIONS, BISHOP)): # Sliders block each other along a direction, so their rays never overlap
+        sliders = pieces[:, kind] | pieces[:, QUEEN]
+        sets += [_slide(sliders, empty, *DIRECTIONS[direction]) for direction in directions]
+    return sets
+
+### EVALUATION
+
+class BatchEvaluation:
+    'Scores of a batch of positions: material and positional score, mobility and attacks of each side'
+
+    __slots__ = ('scores', 'mobility', 'attacks')
+
+    def __init__(self, scores, mobility, attacks):
+        self.scores = scores # (N,) int32 material and piece-square score, from the point of view of the side to move if sides were given, otherwise white's
+        self.mobility = mobility # (N, 2) int32 pseudo-legal moves of each side, without castling or en passant and counting a promotion once
+        self.attacks = attacks # (N, 2) int32 attacks of each side (a square attacked by two pieces counts twice)
+
+    def __len__(self):
+        return len(self.scores)
+
+def material(codes):
+    'Returns the (N,) int32 material and piece-square score of an (N, 64) array of piece codes from white\'s point of view (same as engine.evaluate)'
+
+    return VALUE_TABLE[codes, SQUARE_INDEXES].sum(1, dtype=np.int32)
+
+def evaluate_batch(pieces, sides=None):
+    '''Returns the BatchEvaluation of positions encoded as an (N, 64) array of piece codes or an (N, 12, 64) array of planes
+
+    Takes an (N,) array of sides to move to score each position for its side to move as engine.evaluate does'''
+
+    codes = codes_of(pieces)
+    boards = bitboards(pieces)
+    scores = material(codes)
+    if sides is not None:
+        scores = np.where(np.asarray(sides) == WHITE, scores, -scores)
+
+    occupied = [np.bitwise_or.reduce(boards[:, side*6:side*6 + 6], axis=1) for side in (WHITE, BLACK)]
+    empty = ~(occupied[WHITE] | occupied[BLACK])
+    mobility = np.zeros((len(codes), 2), dtype=np.int32)
+    attacks = np.zeros((len(codes), 2), dtype=np.int32)
+
+    for side in (WHITE, BLACK):
+        sets = attack_sets(boards, side)
+        for index, attacked in enumerate(sets):
+            attacks[:, side] += popcount(attacked)
+            mobility[:, side] += popcount(attacked & (occupied[side ^ 1] if index < 2 else ~occupied[side])) # Pawns only move diagonally to capture
+
+        step = -1 if side == WHITE else 1
+        pushes = _shift(boards[:, side*6 + PAWN], 0, step) & empty
+        doubles = _shift(pushes & np.uint64(PUSH_ROWS[side]), 0, step) & empty
+        mobility[:, side] += popcount(pushes) + popcount(doubles)
+
+    return BatchEvaluation(scores, mobility, attacks)
+
+def attack_maps(pieces):
+    'Returns an (N, 2, 64) uint8 array of the number of pieces of each side attacking every square (same as Board.attack_counts)'
+
+    boards = bitboards(pieces)
+    maps = np.zeros((len(boards), 2, 64), dtype=np.uint8)
+    for side in (WHITE, BLACK):
+        for attacked in attack_sets(boards, side):
+            maps[:, side] += np.unpackbits(attacked.view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    return maps
+
+### COMMAND LINE
+
+def random_positions(count, seed=0, max_plies=80):
+    'Returns a list of count movegen Positions reached by random legal moves from the starting position'
+
+    rng = random.Random(seed)
+    snapshots = []
+    while len(snapshots) < count:
+        position = Position.initial()
+        for _ in range(rng.randrange(max_plies)):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            position.push(rng.choice(moves))
+        snapshots.append(position)
+    return snapshots
+
+def benchmark(positions, output=sys.stdout):
+    'Encodes and evaluates a list of positions, prints positions/s of each step and returns the BatchEvaluation'
+
+    start = time.perf_counter()
+    codes, sides = encode(positions)
+    encoded = time.perf_counter()
+    evaluation = evaluate_batch(codes, sides)
+    evaluated = time.perf_counter()
+
+    count = len(codes)
+    print(f'{count} positions: encoded in {encoded - start:.3f}s ({count/max(encoded - start, 1e-9):.0f}/s), '
+          f'evaluated in {evaluated - encoded:.3f}s ({count/max(evaluated - encoded, 1e-9):.0f}/s)', file=output)
+    return evaluation
+
+def main(arguments=None):
+    'Command line entry point; returns the process exit code'
+
+    parser = argparse.ArgumentParser(description='Evaluates many positions at once with NumPy')
+    parser.add_argument('pgn', nargs='?', help='PGN file whose positions are evaluated')
+    parser.add_argument('--bench', type=int, metavar='N', help='evaluate N random positions')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random positions')
+    arguments = parser.parse_args(arguments)
+
+    if arguments.pgn:
+        from notation import read_games, parse_san
+
+        positions = []
+        with open(arguments.pgn, encoding='utf-8', errors='replace') as source:
+            for game in read_games(source):
+                position = game.start()
+                positions.append(_position_state(position))
+                try:
+                    for san in game.moves:
+                        position.push(parse_san(position, san))
+                        positions.append(_position_state(position))
+                except ValueError: # Positions up to the first illegal move are kept
+                    pass
+    elif arguments.bench:
+        positions = random_positions(arguments.bench, arguments.seed)
+    else:
+        parser.error('a PGN file or --bench is required')
+
+    benchmark(positions)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
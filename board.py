@@ -0,0 +1,654 @@
+'''Simple Chess Board Module
+
+Compact game state core with no display dependency.
+Pieces are small integer codes ((side << 3) | (piece type + 1), 0 for an empty square) stored in a bytearray, squares are ints 0-63
+(row*8 + column like the colrow position strings of the GUI) and side to move, castling rights, en passant square and halfmove clock
+are packed into the same bytearray, so a whole position is copied with a single bytes() call'''
+
+from movegen import Position, IDENTIFIERS, WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, ALL_CASTLING, CASTLING_MASKS, CASTLING_MOVES # Shares piece indexes and castling rules with the move generator so that both produce identical keys
+from zobrist import PIECE_KEYS, SIDE_KEY, CASTLING_KEYS, RepetitionCounter, en_passant_key
+from instrumentation import metrics, counted, timed
+
+EMPTY = 0 # Code of an empty square
+SIDE, CASTLING, EN_PASSANT, HALFMOVE = 64, 65, 66, 67 # Offsets of the packed fields following the 64 squares
+STATE_SIZE = 68 # Number of bytes describing a position
+NO_SQUARE = 64 # Value of the en passant field when en passant is not possible; also returned by in_range for a move that captures nothing
+
+def piece_code(side, kind):
+    'Returns the code of a piece of the given side and piece type'
+
+    return (side << 3) | (kind + 1)
+
+CODE_SIDES = [code >> 3 for code in range(16)] # Side of every piece code
+CODE_KINDS = [(code & 7) - 1 for code in range(16)] # Piece type of every piece code (-1 for an empty square)
+PAWN_CODES = (piece_code(WHITE, PAWN), piece_code(BLACK, PAWN)) # Codes of a pawn of each side
+CODE_KEYS = [PIECE_KEYS[code >> 3][(code & 7) - 1] if 1 <= code & 7 <= 6 else None for code in range(16)] # Zobrist keys of every piece code on every square
+
+### LOOKUP TABLES (BUILT ONCE AT IMPORT)
+
+def _targets(square, offsets):
+    'Returns a tuple of the squares reached from square with the given column and row offsets that stay on the board'
+
+    column, row = square % 8, square // 8
+    return tuple((row+row_offset)*8 + column+column_offset for column_offset, row_offset in offsets if 0 <= column+column_offset < 8 and 0 <= row+row_offset < 8)
+
+def _ray(square, column_offset, row_offset):
+    'Returns a tuple of the squares leaving square in one direction, nearest first'
+
+    column, row = square % 8 + column_offset, square // 8 + row_offset
+    ray = []
+    while 0 <= column < 8 and 0 <= row < 8:
+        ray.append(row*8 + column)
+        column += column_offset
+        row += row_offset
+    return tuple(ray)
+
+KNIGHT_OFFSETS = ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)) # Column and row offsets reachable by a knight
+KING_OFFSETS = ((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)) # Column and row offsets reachable by a king
+LINEAR_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1)) # Directions a rook (or queen) slides along
+DIAGONAL_DIRECTIONS = ((1, 1), (1, -1), (-1, 1), (-1, -1)) # Directions a bishop (or queen) slides along
+SLIDER_DIRECTIONS = {ROOK: LINEAR_DIRECTIONS, BISHOP: DIAGONAL_DIRECTIONS, QUEEN: LINEAR_DIRECTIONS + DIAGONAL_DIRECTIONS} # Directions every slider moves along
+
+KNIGHT_TARGETS = [_targets(square, KNIGHT_OFFSETS) for square in range(64)] # Squares a knight on every square attacks
+KING_TARGETS = [_targets(square, KING_OFFSETS) for square in range(64)] # Squares a king on every square attacks
+PAWN_TARGETS = ([_targets(square, ((-1, -1), (1, -1))) for square in range(64)], [_targets(square, ((-1, 1), (1, 1))) for square in range(64)]) # Squares a pawn of each side on every square attacks
+PAWN_PUSHES = tuple([_targets(square, ((0, forward), (0, 2*forward)) if square // 8 == start else ((0, forward),)) for square in range(64)] for forward, start in ((-1, 6), (1, 1))) # Squares a pawn of each side on every square is pushed to, single push first
+
+RAYS = {direction: [_ray(square, *direction) for square in range(64)] for direction in LINEAR_DIRECTIONS + DIAGONAL_DIRECTIONS} # Squares leaving every square in every direction, nearest first
+LINEAR_RAYS = [tuple(RAYS[direction][square] for direction in LINEAR_DIRECTIONS) for square in range(64)] # Rook rays of every square
+DIAGONAL_RAYS = [tuple(RAYS[direction][square] for direction in DIAGONAL_DIRECTIONS) for square in range(64)] # Bishop rays of every square
+SLIDER_RAYS = {ROOK: LINEAR_RAYS, BISHOP: DIAGONAL_RAYS, QUEEN: [LINEAR_RAYS[square] + DIAGONAL_RAYS[square] for square in range(64)]} # Rays every slider moves along from every square
+
+LINES = [None] * 4096 # Unit direction leading from square a to square b at index a*64 + b, None if they share no row, column or diagonal
+BETWEEN = [()] * 4096 # Squares strictly between square a and square b at index a*64 + b, empty if they share no line
+for _direction in LINEAR_DIRECTIONS + DIAGONAL_DIRECTIONS:
+    for _square in range(64):
+        for _index, _target in enumerate(RAYS[_direction][_square]):
+            LINES[_square*64 + _target] = _direction
+            BETWEEN[_square*64 + _target] = RAYS[_direction][_square][:_index]
+CASTLING_TARGETS = [tuple(final for final in CASTLING_MOVES if final - final % 8 + 4 == square) for square in range(64)] # Castling destinations of a king standing on every square
+
+class UndoRecord:
+    'Small record of everything a move changed on the board, used to take the move back'
+
+    __slots__ = ('initial', 'final', 'captured', 'captured_square', 'rook_move', 'promoted', 'castling', 'en_passant', 'halfmove', 'key')
+
+    def __init__(self, initial, final, castling, en_passant, halfmove, key):
+        self.initial = initial # Initial square of the moved piece
+        self.final = final # Final square of the moved piece
+        self.captured = EMPTY # Code of the captured piece, if any
+        self.captured_square = NO_SQUARE # Square of the captured piece (differs from final for en passant)
+        self.rook_move = None # Initial and final square of the rook if the move is castling
+        self.promoted = EMPTY # Code of the piece the pawn has been promoted to, if any
+        self.castling = castling # Castling rights before the move
+        self.en_passant = en_passant # En passant square before the move
+        self.halfmove = halfmove # Halfmove clock before the move
+        self.key = key # Position key before the move
+
+class Board:
+    'Compact chess position with incremental attack maps, Zobrist key and make/unmake of moves'
+
+    square_positions = [f'{index % 8}{index // 8}' for index in range(64)] # Maps every square index back to its colrow position string
+
+    castling_paths = {final: tuple(square for square in range(64) if between >> square & 1) for final, (_, _, _, between, _) in CASTLING_MOVES.items()} # Squares that must be empty for every castling move, indexed by the king destination
+
+    def __init__(self):
+        self.state = bytearray(STATE_SIZE) # Piece codes of the 64 squares followed by the packed fields
+        self.state[CASTLING] = ALL_CASTLING
+        self.state[EN_PASSANT] = NO_SQUARE
+
+        self.king_squares = [NO_SQUARE, NO_SQUARE] # Square of the king of each side
+        self.attacks = [()] * 64 # Square indexes attacked by the piece standing on every square
+        self.attack_counts = (bytearray(64), bytearray(64)) # Number of pieces of each side attacking every square
+        self.version = 0 # Incremented whenever a square changes so cached lookups know when they are stale
+        self.king_safety_cache = [None, None] # Checkers and pinned pieces of each side, computed for the current version
+
+        self.key = CASTLING_KEYS[ALL_CASTLING] # Zobrist key of the position, updated incrementally with every change
+        self.repetitions = RepetitionCounter() # Counts the occurrences of every position of the game
+        self.history = [] # Undo records of the moves played, most recent last
+
+    ### STATE
+
+    @property
+    def side(self):
+        'Side to move (0 for white, 1 for black)'
+
+        return self.state[SIDE]
+
+    @property
+    def castling(self):
+        'Castling right bits (same layout as movegen)'
+
+        return self.state[CASTLING]
+
+    @property
+    def en_passant(self):
+        'Square behind a pawn that has just been pushed twice, or None'
+
+        square = self.state[EN_PASSANT]
+        return None if square == NO_SQUARE else square
+
+    def snapshot(self):
+        'Returns the whole position as an immutable bytes object'
+
+        return bytes(self.state)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        'Returns a new board holding the position of a snapshot (history and repetitions are not included)'
+
+        board = cls()
+        for square in range(64):
+            if snapshot[square]:
+                board.place(snapshot[square], square)
+
+        board.state[SIDE:] = snapshot[SIDE:]
+        board.key = board.compute_key()
+        return board
+
+    @classmethod
+    def from_position(cls, position):
+        'Returns a new board holding a movegen Position (such as one read from FEN)'
+
+        board = cls()
+        board.set_position(position)
+        return board
+
+    def set_position(self, position):
+        'Replaces the position of the board with a movegen Position; history and repetitions are cleared'
+
+        self.clear()
+        for square, code in enumerate(position.squares):
+            if code is not None:
+                self.place(piece_code(code >> 3, code & 7), square)
+
+        self.state[SIDE], self.state[CASTLING] = position.side, position.castling
+        self.state[EN_PASSANT] = NO_SQUARE if position.en_passant is None else position.en_passant
+        self.state[HALFMOVE] = min(position.halfmove, 255)
+        self.key = self.compute_key()
+
+    def to_position(self):
+        'Returns the position as a movegen Position for bulk move generation'
+
+        position = Position()
+        for square in range(64):
+            if self.state[square]:
+                position.put(CODE_SIDES[self.state[square]], CODE_KINDS[self.state[square]], square)
+
+        position.side, position.castling, position.en_passant, position.halfmove = self.side, self.castling, self.en_passant, self.state[HALFMOVE]
+        position.key = position.compute_key()
+        return position
+
+    def compute_key(self):
+        'Returns the Zobrist key of the position computed from scratch'
+
+        key = SIDE_KEY if self.side else 0
+        for square in range(64):
+            if self.state[square]:
+                key ^= CODE_KEYS[self.state[square]][square]
+        return key ^ CASTLING_KEYS[self.castling] ^ en_passant_key(self.state, self.en_passant, PAWN_CODES)
+
+    ### SQUARES
+
+    def place(self, code, square):
+        'Places the piece with the given code on an empty square'
+
+        self.state[square] = code
+        self.key ^= CODE_KEYS[code][square]
+
+        if CODE_KINDS[code] == KING: # Kings are tracked so that check lookups do not need to search the board
+            self.king_squares[CODE_SIDES[code]] = square
+
+        self.__add_attacks(square) # Adds the attacks of the new piece
+        self.__refresh_sliders(square) # Rays passing through the square are now blocked
+        self.version += 1
+
+    def remove(self, square):
+        'Removes and returns the code of the piece standing on square (EMPTY if there is none)'
+
+        code = self.state[square]
+
+        if code:
+            self.__remove_attacks(square) # Removes the attacks of the piece
+            self.state[square] = EMPTY
+            self.key ^= CODE_KEYS[code][square]
+            self.__refresh_sliders(square) # Rays that were blocked by the piece now continue through the square
+            self.version += 1
+
+        return code
+
+    def move(self, initial, final):
+        'Moves the piece standing on square initial to square final and returns the code of the piece previously standing on final'
+
+        captured = self.remove(final) # Anything standing on the final square is overwritten
+        self.place(self.remove(initial), final)
+
+        return captured
+
+    def clear(self):
+        'Removes every piece from the board'
+
+        self.__init__()
+
+    def is_attacked(self, square, side):
+        'Returns True or False depending on whether any piece of the given side attacks square; answered from the attack map in constant time'
+
+        return self.attack_counts[side][square] > 0
+
+    def in_check(self, side):
+        'Returns True or False depending on whether the king of the given side is being checked'
+
+        return self.attack_counts[side ^ 1][self.king_squares[side]] > 0
+
+    ### MOVEMENT RULES
+
+    def in_range(self, initial, final):
+        '''Returns None if the piece on square initial cannot reach square final, otherwise the square of the piece it captures (NO_SQUARE if it captures nothing)
+
+        Checks how the piece moves, blocking pieces, en passant and castling but not whether the move leaves its own king in check'''
+
+        state = self.state
+        code = state[initial]
+        side, kind = CODE_SIDES[code], CODE_KINDS[code]
+        target = state[final]
+
+        if target and CODE_SIDES[target] == side: # Square blocked by friendly piece
+            return None
+
+        captured = final if target else NO_SQUARE
+
+        if kind == PAWN:
+            if final in PAWN_PUSHES[side][initial]: # Pushes need empty squares
+                if target or final != PAWN_PUSHES[side][initial][0] and state[PAWN_PUSHES[side][initial][0]]: # Double push also needs the square it passes over
+                    return None
+                return NO_SQUARE
+            if final in PAWN_TARGETS[side][initial]: # Captures go diagonally forwards
+                if target:
+                    return final
+                if final == state[EN_PASSANT]: # Enemy pawn standing next to the pawn has just passed over the square
+                    return initial - initial % 8 + final % 8
+            return None
+
+        if kind == KNIGHT:
+            return captured if final in KNIGHT_TARGETS[initial] else None
+
+        if kind == KING:
+            if final in KING_TARGETS[initial]:
+                return captured
+            if final - initial in (2, -2) and self.__can_castle(initial, final, side):
+                return NO_SQUARE
+            return None
+
+        if LINES[initial*64 + final] not in SLIDER_DIRECTIONS[kind]: # Sliders move along their directions until blocked
+            return None
+
+        for square in BETWEEN[initial*64 + final]:
+            if state[square]: # Square in between is blocked
+                return None
+        return captured
+
+    def __can_castle(self, initial, final, side):
+        'Returns True if the king of side on initial may castle to final (landing on an attacked square is rejected by is_legal)'
+
+        if final not in CASTLING_MOVES or initial != (60 if side == WHITE else 4):
+            return False
+
+        right, _, _, _, crossed = CASTLING_MOVES[final]
+        if not self.state[CASTLING] & right: # King or rook has moved, or rook has been captured
+            return False
+
+        for square in Board.castling_paths[final]:
+            if self.state[square]: # Piece is in the way of castling
+                return False
+
+        return not self.in_check(side) and not self.is_attacked(crossed[0], side ^ 1) # King may not castle out of or through check
+
+    def is_legal(self, initial, final, captured=NO_SQUARE):
+        '''Returns True or False depending on whether moving the piece on square initial to final leaves its own king safe
+
+        Takes the captured square returned by in_range as third argument
+        Answered from the attack map and the checkers and pins of the king without playing the move'''
+
+        side = CODE_SIDES[self.state[initial]]
+        king = self.king_squares[side]
+        checkers, pins = self.king_safety(side)
+
+        if initial == king:
+            if self.attack_counts[side ^ 1][final]: # King walks into an attacked square
+                return False
+            for checker in checkers: # King cannot step away along the ray of a slider giving check, the king itself was blocking it
+                if CODE_KINDS[self.state[checker]] in (ROOK, BISHOP, QUEEN) and LINES[checker*64 + king] == LINES[king*64 + final]:
+                    return False
+            return True
+
+        if captured != NO_SQUARE and captured != final: # En passant removes two pieces from the same row so it is tested by playing it
+            self.make_move(initial, final)
+            legal = not self.in_check(side)
+            self.unmake_move() # Takes the temporary move back
+            return legal
+
+        if len(checkers) > 1: # Only the king can escape a double check
+            return False
+
+        if initial in pins and LINES[king*64 + final] != pins[initial]: # Pinned piece leaves the line of its pin
+            return False
+
+        if checkers: # Check must be answered by capturing the checker or blocking its ray
+            checker = checkers[0]
+            if final == checker:
+                return True
+            if CODE_KINDS[self.state[checker]] in (KNIGHT, PAWN): # Knight and pawn checks cannot be blocked
+                return False
+            return final in BETWEEN[king*64 + checker] # Blocking square lies between the king and the checker
+
+        return True
+
+    ### GAME END
+
+    def has_legal_move(self):
+        '''Returns True or False depending on whether the side to move has any legal move
+
+        Stops at the first legal move found. Candidate squares come from the attack map (plus pawn pushes) instead of every square of the board,
+        king moves are tried first and only the king is tried against a double check. Castling is never needed: if castling is legal, so is
+        the king step towards the rook'''
+
+        state = self.state
+        side = self.side
+        king = self.king_squares[side]
+
+        for target in self.attacks[king]:
+            if (not state[target] or CODE_SIDES[state[target]] != side) and self.is_legal(king, target):
+                return True
+
+        if len(self.king_safety(side)[0]) > 1: # Only the king can escape a double check
+            return False
+
+        for square in range(64):
+            code = state[square]
+            if not code or CODE_SIDES[code] != side or square == king:
+                continue
+
+            if CODE_KINDS[code] == PAWN: # Pawn pushes are not attacks and pawn attacks are only moves with a capture, so in_range decides
+                for targets in (PAWN_PUSHES[side][square], self.attacks[square]):
+                    for target in targets:
+                        captured = self.in_range(square, target)
+                        if captured is not None and self.is_legal(square, target, captured):
+                            return True
+            else: # Every attacked square not holding a friendly piece can be reached
+                for target in self.attacks[square]:
+                    if not state[target]:
+                        if self.is_legal(square, target):
+                            return True
+                    elif CODE_SIDES[state[target]] != side and self.is_legal(square, target, target):
+                        return True
+
+        return False
+
+    def legal_targets(self):
+        '''Returns a dictionary mapping the square of every piece of the side to move that has a legal move to a dictionary mapping
+        each of its destination squares to the square of the piece captured there (NO_SQUARE if nothing is captured)
+
+        Candidate squares come from the attack map plus pawn pushes and castling, so in_range and is_legal only run on squares the piece could reach'''
+
+        state = self.state
+        side = self.side
+        targets = {}
+
+        for square in range(64):
+            code = state[square]
+            if not code or CODE_SIDES[code] != side:
+                continue
+
+            kind = CODE_KINDS[code]
+            candidates = self.attacks[square]
+            if kind == PAWN: # Pawn pushes are not attacks
+                candidates = PAWN_PUSHES[side][square] + candidates
+            elif kind == KING:
+                candidates = candidates + CASTLING_TARGETS[square]
+
+            moves = {}
+            for final in candidates:
+                captured = self.in_range(square, final)
+                if captured is not None and self.is_legal(square, final, captured):
+                    moves[final] = captured
+            if moves:
+                targets[square] = moves
+
+        return targets
+
+    def insufficient_material(self):
+        'Returns True if neither side can checkmate: kings only, a single knight or bishop, or bishops all standing on squares of one colour'
+
+        minors = [] # Piece type and square colour of every knight and bishop
+        for square in range(64):
+            kind = CODE_KINDS[self.state[square]]
+            if kind in (PAWN, ROOK, QUEEN):
+                return False
+            if kind in (KNIGHT, BISHOP):
+                minors.append((kind, (square%8 + square//8) % 2))
+
+        if len(minors) <= 1:
+            return True
+        return all(kind == BISHOP for kind, _ in minors) and len({colour for _, colour in minors}) == 1
+
+    ### MAKING MOVES
+
+    def make_move(self, initial, final, promotion=None):
+        '''Plays the move of the piece on square initial to square final and returns its undo record
+
+        Captures (including en passant), the rook move of castling, castling rights, en passant square, halfmove clock, key and repetitions are updated
+        A pawn reaching the last row is promoted to the piece type promotion if one is given, otherwise promote() can be called afterwards'''
+
+        state = self.state
+        code = state[initial]
+        kind = CODE_KINDS[code]
+        record = UndoRecord(initial, final, state[CASTLING], state[EN_PASSANT], state[HALFMOVE], self.key)
+        self.__set_en_passant(NO_SQUARE) # Cleared before the pieces move, while the pawns that could capture are still in place
+
+        if state[final]:
+            record.captured_square = final
+        elif kind == PAWN and final == record.en_passant: # Pawn standing next to the moved pawn is captured en passant
+            record.captured_square = initial - initial % 8 + final % 8
+
+        if record.captured_square != NO_SQUARE:
+            record.captured = self.remove(record.captured_square)
+
+        self.__set_castling(state[CASTLING] & CASTLING_MASKS[initial] & CASTLING_MASKS[final]) # Removes castling rights lost by the move
+        self.move(initial, final)
+
+        if kind == KING and abs(final - initial) == 2: # King has castled
+            record.rook_move = CASTLING_MOVES[final][1:3]
+            self.move(*record.rook_move) # Moves the rook next to the king
+
+        if kind == PAWN and abs(final - initial) == 16:
+            self.__set_en_passant((initial + final) // 2) # Square a pawn pushed twice has passed over
+        state[HALFMOVE] = 0 if kind == PAWN or record.captured else min(state[HALFMOVE] + 1, 255)
+
+        state[SIDE] ^= 1
+        self.key ^= SIDE_KEY
+        self.history.append(record)
+        self.repetitions.push(self.key)
+
+        if promotion is not None and kind == PAWN and final // 8 in (0, 7):
+            self.promote(promotion)
+
+        return record
+
+    def promote(self, kind):
+        'Replaces the pawn moved by the last move with a piece of the given piece type'
+
+        record = self.history[-1]
+        self.repetitions.pop() # Position recorded with the pawn still on the board is replaced
+
+        record.promoted = piece_code(CODE_SIDES[self.state[record.final]], kind)
+        self.remove(record.final)
+        self.place(record.promoted, record.final)
+
+        self.repetitions.push(self.key)
+
+    def unmake_move(self):
+        'Takes back the last move and returns its undo record'
+
+        record = self.history.pop()
+        self.repetitions.pop()
+
+        if record.promoted: # Turns the promoted piece back into a pawn
+            self.remove(record.final)
+            self.place(piece_code(CODE_SIDES[record.promoted], PAWN), record.final)
+
+        if record.rook_move is not None: # Moves the castled rook back to its corner
+            self.move(record.rook_move[1], record.rook_move[0])
+
+        self.move(record.final, record.initial)
+
+        if record.captured:
+            self.place(record.captured, record.captured_square)
+
+        state = self.state
+        state[SIDE] ^= 1
+        state[CASTLING], state[EN_PASSANT], state[HALFMOVE] = record.castling, record.en_passant, record.halfmove
+        self.key = record.key # Restores the state the pieces alone do not describe
+
+        return record
+
+    def __set_castling(self, castling):
+        'Updates the castling right bits and the key'
+
+        self.key ^= CASTLING_KEYS[self.state[CASTLING]] ^ CASTLING_KEYS[castling]
+        self.state[CASTLING] = castling
+
+    def __set_en_passant(self, square):
+        'Updates the en passant square (NO_SQUARE to disable en passant) and the key, which only includes a square a pawn can capture on'
+
+        self.key ^= en_passant_key(self.state, self.en_passant, PAWN_CODES)
+        self.state[EN_PASSANT] = square
+        self.key ^= en_passant_key(self.state, self.en_passant, PAWN_CODES)
+
+    ### REPETITIONS
+
+    def record_position(self):
+        'Records an occurrence of the current position (such as the starting position) and returns how many times it has occurred'
+
+        return self.repetitions.push(self.key)
+
+    def repetition_count(self):
+        'Returns how many times the current position has occurred (threefold repetition once it reaches 3)'
+
+        return self.repetitions.count(self.key)
+
+    ### ATTACK MAPS
+
+    def __attacked_squares(self, square, code):
+        'Returns a tuple of the square indexes attacked by the piece with the given code standing on square'
+
+        kind = CODE_KINDS[code]
+        if kind == PAWN: # Pawns only attack diagonally forwards
+            return PAWN_TARGETS[CODE_SIDES[code]][square]
+        if kind == KNIGHT:
+            return KNIGHT_TARGETS[square]
+        if kind == KING:
+            return KING_TARGETS[square]
+
+        state = self.state
+        attacked = [] # Sliders attack every square up to and including the first piece in each of their directions
+        for ray in SLIDER_RAYS[kind][square]:
+            for target in ray:
+                attacked.append(target)
+                if state[target]:
+                    break
+        return tuple(attacked)
+
+    def __add_attacks(self, square):
+        'Computes the attacks of the piece standing on square and adds them to the attack counts of its side'
+
+        code = self.state[square]
+        attacked = self.attacks[square] = self.__attacked_squares(square, code)
+        counts = self.attack_counts[CODE_SIDES[code]]
+        for target in attacked:
+            counts[target] += 1
+
+    def __remove_attacks(self, square):
+        'Subtracts the stored attacks of the piece standing on square from the attack counts of its side'
+
+        counts = self.attack_counts[CODE_SIDES[self.state[square]]]
+        for target in self.attacks[square]:
+            counts[target] -= 1
+        self.attacks[square] = ()
+
+    def __refresh_sliders(self, square):
+        'Recomputes the attacks of the sliders whose rays reach square, since those are the only attacks a change on square affects'
+
+        state = self.state
+        for rays, kinds in ((LINEAR_RAYS[square], (ROOK, QUEEN)), (DIAGONAL_RAYS[square], (BISHOP, QUEEN))):
+            for ray in rays:
+                for target in ray:
+                    code = state[target]
+                    if code: # First piece on the ray
+                        if CODE_KINDS[code] in kinds: # Slider looking back along the ray
+                            self.__remove_attacks(target)
+                            self.__add_attacks(target)
+                        break
+
+    ### CHECKS AND PINS
+
+    def king_safety(self, side):
+        '''Returns a tuple (checkers, pins) for the king of the given side
+
+        checkers is a list of square indexes of enemy pieces giving check
+        pins is a dictionary mapping the square index of every pinned friendly piece to the direction of its pin as seen from the king'''
+
+        cached = self.king_safety_cache[side]
+        if cached is not None and cached[0] == self.version: # Board has not changed since the last lookup
+            return cached[1]
+
+        square = self.king_squares[side]
+        state = self.state
+        checkers = []
+        pins = {}
+
+        if self.attack_counts[side ^ 1][square]: # Knight and pawn checks only need to be looked for if the king is attacked
+            for targets, kind in ((KNIGHT_TARGETS[square], KNIGHT), (PAWN_TARGETS[side][square], PAWN)): # Pawns checking the king stand where a pawn of its side would attack
+                for target in targets:
+                    code = state[target]
+                    if code and CODE_SIDES[code] != side and CODE_KINDS[code] == kind:
+                        checkers.append(target)
+
+        for directions, kinds in ((LINEAR_DIRECTIONS, (ROOK, QUEEN)), (DIAGONAL_DIRECTIONS, (BISHOP, QUEEN))):
+            for direction in directions:
+                shield = None # Friendly piece found between the king and a possible pinner
+                for target in RAYS[direction][square]:
+                    code = state[target]
+                    if code:
+                        if CODE_SIDES[code] == side:
+                            if shield is not None: # Two friendly pieces on the ray, nothing can be pinned
+                                break
+                            shield = target
+                        else:
+                            if CODE_KINDS[code] in kinds:
+                                if shield is None:
+                                    checkers.append(target)
+                                else:
+                                    pins[shield] = direction
+                            break
+
+        self.king_safety_cache[side] = (self.version, (checkers, pins))
+        return checkers, pins
+
+### INSTRUMENTATION (ONLY WRAPPED WHILE METRICS ARE ENABLED)
+
+IN_RANGE_COUNTERS = [f'board.in_range.{IDENTIFIERS[kind] or "P"}' for kind in range(6)] # Counter of the in_range calls of every piece type
+
+def _count_in_range(method):
+    'Returns in_range counting its calls per piece type'
+
+    def in_range(self, initial, final):
+        metrics.count(IN_RANGE_COUNTERS[CODE_KINDS[self.state[initial]]])
+        return method(self, initial, final)
+    return in_range
+
+metrics.instrument(Board, 'in_range', _count_in_range)
+metrics.instrument(Board, 'in_check', counted('board.in_check'))
+metrics.instrument(Board, 'is_legal', timed('board.is_legal'))
+metrics.instrument(Board, 'legal_targets', timed('board.legal_targets'))
+metrics.instrument(Board, 'make_move', timed('board.make_move'))
+metrics.instrument(Board, 'unmake_move', timed('board.unmake_move'))
@@ -0,0 +1,372 @@
+'''Simple Chess Engine Module
+
+Computer opponent searching movegen positions with negamax alpha-beta, iterative deepening, quiescence search and a transposition table.
+Moves are ordered by transposition table move, captures by most valuable victim / least valuable attacker, killer moves and the history heuristic.
+
+Usage:
+    python engine.py --time 1                  (searches the starting position for one second)
+    python engine.py --fen "<FEN>" --depth 5
+    python engine.py --bench --time 0.5        (fixed time per move over the perft reference positions)'''
+
+import argparse
+import sys
+import time
+
+from movegen import Position, WHITE, PAWN, EN_PASSANT, move_name
+from zobrist import TranspositionTable
+
+PIECE_VALUES = (100, 320, 330, 500, 900, 0) # Material value of every piece type in centipawns
+
+PIECE_SQUARE_TABLES = (
+        (0, 0, 0, 0, 0, 0, 0, 0,
+         50, 50, 50, 50, 50, 50, 50, 50,
+         10, 10, 20, 30, 30, 20, 10, 10,
+         5, 5, 10, 25, 25, 10, 5, 5,
+         0, 0, 0, 20, 20, 0, 0, 0,
+         5, -5, -10, 0, 0, -10, -5, 5,
+         5, 10, 10, -20, -20, 10, 10, 5,
+         0, 0, 0, 0, 0, 0, 0, 0),
+        (-50, -40, -30, -30, -30, -30, -40, -50,
+         -40, -20, 0, 0, 0, 0, -20, -40,
+         -30, 0, 10, 15, 15, 10, 0, -30,
+         -30, 5, 15, 20, 20, 15, 5, -30,
+         -30, 0, 15, 20, 20, 15, 0, -30,
+         -30, 5, 10, 15, 15, 10, 5, -30,
+         -40, -20, 0, 5, 5, 0, -20, -40,
+         -50, -40, -30, -30, -30, -30, -40, -50),
+        (-20, -10, -10, -10, -10, -10, -10, -20,
+         -10, 0, 0, 0, 0, 0, 0, -10,
+         -10, 0, 5, 10, 10, 5, 0, -10,
+         -10, 5, 5, 10, 10, 5, 5, -10,
+         -10, 0, 10, 10, 10, 10, 0, -10,
+         -10, 10, 10, 10, 10, 10, 10, -10,
+         -10, 5, 0, 0, 0, 0, 5, -10,
+         -20, -10, -10, -10, -10, -10, -10, -20),
+        (0, 0, 0, 0, 0, 0, 0, 0,
+         5, 10, 10, 10, 10, 10, 10, 5,
+         -5, 0, 0, 0, 0, 0, 0, -5,
+         -5, 0, 0, 0, 0, 0, 0, -5,
+         -5, 0, 0, 0, 0, 0, 0, -5,
+         -5, 0, 0, 0, 0, 0, 0, -5,
+         -5, 0, 0, 0, 0, 0, 0, -5,
+         0, 0, 0, 5, 5, 0, 0, 0),
+        (-20, -10, -10, -5, -5, -10, -10, -20,
+         -10, 0, 0, 0, 0, 0, 0, -10,
+         -10, 0, 5, 5, 5, 5, 0, -10,
+         -5, 0, 5, 5, 5, 5, 0, -5,
+         0, 0, 5, 5, 5, 5, 0, -5,
+         -10, 5, 5, 5, 5, 5, 0, -10,
+         -10, 0, 5, 0, 0, 0, 0, -10,
+         -20, -10, -10, -5, -5, -10, -10, -20),
+        (-30, -40, -40, -50, -50, -40, -40, -30,
+         -30, -40, -40, -50, -50, -40, -40, -30,
+         -30, -40, -40, -50, -50, -40, -40, -30,
+         -30, -40, -40, -50, -50, -40, -40, -30,
+         -20, -30, -30, -40, -40, -30, -30, -20,
+         -10, -20, -20, -20, -20, -20, -20, -10,
+         20, 20, 0, 0, 0, 0, 20, 20,
+         20, 30, 10, 0, 0, 10, 30, 20)
+        ) # Positional bonus of every piece type on every square from white's point of view (square 0 is the top left corner)
+
+SQUARE_VALUES = [[[PIECE_VALUES[kind] + PIECE_SQUARE_TABLES[kind][square if side == WHITE else square ^ 56] for square in range(64)] for kind in range(6)] for side in range(2)] # Material and positional value of every piece, indexed by side, piece type and square (black mirrors the rows)
+
+MATE = 100000 # Score of giving checkmate on the current move
+MATE_BOUND = MATE - 1000 # Scores beyond this are mates found within the search
+MAX_DEPTH = 64 # Deepest iteration searched when no depth is given
+EXACT, LOWER, UPPER = 0, 1, 2 # Bounds of the scores stored in the transposition table
+CHECK_INTERVAL = 1023 # Nodes between two time checks (mask)
+
+def evaluate(position):
+    'Returns the material and positional score of position from the point of view of the side to move'
+
+    score = 0
+    for side, sign in ((0, 1), (1, -1)):
+        values = SQUARE_VALUES[side]
+        for kind, bitboard in enumerate(position.pieces[side]):
+            table = values[kind]
+            while bitboard:
+                bit = bitboard & -bitboard
+                bitboard ^= bit
+                score += sign * table[bit.bit_length() - 1]
+    return score if position.side == WHITE else -score
+
+class SearchTimeout(Exception):
+    'Raised inside the search when the time budget has run out or the search has been cancelled'
+
+class SearchResult:
+    'Outcome of a search: best move, its score, depth reached, nodes searched and elapsed time'
+
+    __slots__ = ('move', 'score', 'depth', 'nodes', 'elapsed')
+
+    def __init__(self, move, score, depth, nodes, elapsed):
+        self.move = move # Best move found as a movegen move integer, None if the side to move has no legal move
+        self.score = score # Score in centipawns from the point of view of the side to move
+        self.depth = depth # Deepest completed iteration
+        self.nodes = nodes # Nodes searched, including quiescence nodes
+        self.elapsed = elapsed # Seconds spent searching
+
+    @property
+    def nodes_per_second(self):
+        'Search speed'
+
+        return self.nodes / max(self.elapsed, 1e-9)
+
+    def __str__(self):
+        return f'depth {self.depth} score {self.score} nodes {self.nodes} time {self.elapsed:.3f}s nps {self.nodes_per_second:.0f} bestmove {move_name(self.move) if self.move is not None else "none"}'
+
+class Search:
+    'Iterative deepening alpha-beta search of a single position'
+
+    __slots__ = ('position', 'table', 'killers', 'history', 'nodes', 'deadline', 'stop', 'root_length')
+
+    def __init__(self, position, table=None):
+        self.position = position # Position searched; moves are pushed and popped in place
+        self.table = table if table is not None else TranspositionTable() # Scores and best moves of searched positions as (score, bound, move)
+        self.killers = [[None, None] for ply in range(MAX_DEPTH)] # Two quiet moves that caused a cutoff at every ply
+        self.history = [0] * (2*64*64) # Cutoff counts of quiet moves indexed by side, initial and final square
+        self.nodes = 0
+        self.deadline = None # Time at which the search stops
+        self.stop = None # Event (such as a multiprocessing.Event) stopping the search once it is set
+        self.root_length = 0
+
+    def run(self, time_limit=None, depth=None, info=None, stop=None, first_depth=1):
+        '''Searches until time_limit seconds have passed, depth has been completed or stop is set and returns a SearchResult
+
+        info is called with the SearchResult of every completed iteration; first_depth staggers the iterations of parallel searches'''
+
+        start = time.perf_counter()
+        self.deadline = start + time_limit if time_limit is not None else None
+        self.stop = stop
+        self.nodes = 0
+        self.root_length = len(self.position.history)
+        self.table.new_search()
+
+        moves = self.position.legal_moves()
+        if not moves: # Checkmate or stalemate
+            return SearchResult(None, -MATE if self.position.in_check() else 0, 0, 0, 0.0)
+
+        result = SearchResult(moves[0], 0, 0, 0, 0.0)
+        for current_depth in range(first_depth, (depth or MAX_DEPTH) + 1):
+            try:
+                score, move = self.__root(moves, current_depth)
+            except SearchTimeout:
+                while len(self.position.history) > self.root_length: # Takes back the moves of the interrupted iteration
+                    self.position.pop()
+                break
+
+            elapsed = time.perf_counter() - start
+            result = SearchResult(move, score, current_depth, self.nodes, elapsed)
+            if info is not None:
+                info(result)
+
+            if abs(score) > MATE_BOUND: # Forced mate found, deeper iterations cannot improve it
+                break
+            if self.deadline is not None and elapsed > (self.deadline - start) / 2: # Next iteration would most likely not finish
+                break
+
+        result.nodes, result.elapsed = self.nodes, time.perf_counter() - start
+        return result
+
+    def __root(self, moves, depth):
+        'Searches every root move to depth and returns the best score and move'
+
+        entry = self.table.probe(self.position.key)
+        hash_move = entry[1][2] if entry is not None else None
+        moves.sort(key=lambda move: self.__order(move, hash_move, 0), reverse=True)
+
+        alpha, beta = -MATE - 1, MATE + 1
+        best_move = moves[0]
+        for move in moves:
+            self.position.push(move)
+            score = -self.__negamax(depth - 1, -beta, -alpha, 1)
+            self.position.pop()
+            if score > alpha:
+                alpha, best_move = score, move
+
+        moves.remove(best_move) # Best move is searched first by the next iteration
+        moves.insert(0, best_move)
+        self.table.store(self.position.key, depth, (alpha, EXACT, best_move))
+        return alpha, best_move
+
+    def __negamax(self, depth, alpha, beta, ply):
+        'Returns the score of the position searched to depth within the window alpha, beta'
+
+        position = self.position
+        self.nodes += 1
+        if not self.nodes & CHECK_INTERVAL and self.__stopped():
+            raise SearchTimeout
+
+        if self.__is_draw():
+            return 0
+
+        in_check = position.in_check()
+        if in_check: # Check extension, so that forced sequences of checks are not cut short
+            depth += 1
+
+        if depth <= 0 or ply >= MAX_DEPTH:
+            return self.__quiescence(alpha, beta, ply)
+
+        original_alpha = alpha
+        hash_move = None
+        entry = self.table.probe(position.key)
+        if entry is not None:
+            entry_depth, (score, bound, hash_move) = entry
+            if entry_depth >= depth:
+                score = score - ply if score > MATE_BOUND else score + ply if score < -MATE_BOUND else score # Mate scores are stored relative to the position
+                if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+                    return score
+
+        side = position.side
+        best_score, best_move = -MATE - 1, None
+        moves = sorted(position.pseudo_legal_moves(), key=lambda move: self.__order(move, hash_move, ply), reverse=True)
+
+        for move in moves:
+            position.push(move)
+            if position.is_attacked(position.king_square(side), side ^ 1): # Move leaves its own king in check
+                position.pop()
+                continue
+
+            score = -self.__negamax(depth - 1, -beta, -alpha, ply + 1)
+            position.pop()
+
+            if score > best_score:
+                best_score, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if not self.__is_capture(move): # Quiet moves causing a cutoff are tried early in sibling positions
+                            killers = self.killers[ply]
+                            if killers[0] != move:
+                                killers[1], killers[0] = killers[0], move
+                            self.history[(side << 12) | (move & 4095)] += depth * depth
+                        break
+
+        if best_move is None: # No legal move
+            return -MATE + ply if in_check else 0
+
+        bound = LOWER if best_score >= beta else UPPER if best_score <= original_alpha else EXACT
+        stored = best_score + ply if best_score > MATE_BOUND else best_score - ply if best_score < -MATE_BOUND else best_score
+        self.table.store(position.key, depth, (stored, bound, best_move))
+        return best_score
+
+    def __quiescence(self, alpha, beta, ply):
+        'Returns the score of the position once captures and promotions have been played out'
+
+        position = self.position
+        self.nodes += 1
+        if not self.nodes & CHECK_INTERVAL and self.__stopped():
+            raise SearchTimeout
+
+        stand_pat = evaluate(position) # Side to move may decline every capture
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+
+        side = position.side
+        moves = [move for move in position.pseudo_legal_moves() if self.__is_capture(move) or move >> 12 & 7]
+        moves.sort(key=lambda move: self.__order(move, None, ply), reverse=True)
+
+        for move in moves:
+            position.push(move)
+            if position.is_attacked(position.king_square(side), side ^ 1):
+                position.pop()
+                continue
+
+            score = -self.__quiescence(-beta, -alpha, ply + 1)
+            position.pop()
+
+            if score >= beta:
+                return score
+            alpha = max(alpha, score)
+
+        return alpha
+
+    def __stopped(self):
+        'Returns True if the time budget has run out or the search has been cancelled'
+
+        return (self.deadline is not None and time.perf_counter() > self.deadline) or (self.stop is not None and self.stop.is_set())
+
+    def __is_capture(self, move):
+        'Returns True if move captures a piece'
+
+        return self.position.squares[(move >> 6) & 63] is not None or move >> 15 == EN_PASSANT
+
+    def __order(self, move, hash_move, ply):
+        'Returns the ordering score of move; higher scores are searched first'
+
+        if move == hash_move:
+            return 1 << 30
+
+        squares = self.position.squares
+        victim = squares[(move >> 6) & 63]
+        if victim is not None or move >> 15 == EN_PASSANT: # Most valuable victim, least valuable attacker
+            return (1 << 28) + PIECE_VALUES[victim & 7 if victim is not None else PAWN] * 8 - (squares[move & 63] & 7)
+        if move >> 12 & 7: # Promotion
+            return (1 << 28) + PIECE_VALUES[move >> 12 & 7]
+
+        killers = self.killers[ply] if ply < MAX_DEPTH else (None, None)
+        if move == killers[0]:
+            return 1 << 27
+        if move == killers[1]:
+            return (1 << 27) - 1
+        return self.history[(self.position.side << 12) | (move & 4095)]
+
+    def __is_draw(self):
+        'Returns True if the position is drawn by the fifty-move rule or repeats an earlier position of the line'
+
+        position = self.position
+        if position.halfmove >= 100:
+            return True
+
+        history = position.history
+        key = position.key
+        for index in range(len(history) - 2, max(len(history) - position.halfmove, 0) - 1, -2): # Only positions with the same side to move since the last irreversible move
+            if history[index][5] == key:
+                return True
+        return False
+
+def search(position, time_limit=None, depth=None, table=None, info=None, stop=None):
+    '''Returns the SearchResult of searching position for time_limit seconds or to depth
+
+    Takes a movegen Position (Board.to_position() gives the position shown by the GUI)'''
+
+    return Search(position, table).run(time_limit, depth, info, stop)
+
+def benchmark(time_limit, output=sys.stdout):
+    'Searches every perft reference position for a fixed time and prints the depth reached and nodes/s; returns the total nodes/s'
+
+    from perft import REFERENCE_POSITIONS
+
+    total_nodes = total_time = 0
+    for name, fen, _ in REFERENCE_POSITIONS:
+        result = search(Position.from_fen(fen), time_limit)
+        total_nodes += result.nodes
+        total_time += result.elapsed
+        print(f'{name:<18} {result}', file=output)
+
+    print(f'Total {total_nodes} nodes in {total_time:.3f}s ({total_nodes/max(total_time, 1e-9):.0f} nodes/s)', file=output)
+    return total_nodes / max(total_time, 1e-9)
+
+def main(arguments=None):
+    'Command line entry point; returns the process exit code'
+
+    parser = argparse.ArgumentParser(description='Searches a position for the best move and reports the depth reached and nodes/s')
+    parser.add_argument('--fen', help='position to search (defaults to the starting position)')
+    parser.add_argument('--time', type=float, help='seconds to search (default 1 unless --depth is given)')
+    parser.add_argument('--depth', type=int, help='deepest iteration to search')
+    parser.add_argument('--bench', action='store_true', help='search the perft reference positions for a fixed time per move')
+    arguments = parser.parse_args(arguments)
+
+    time_limit = arguments.time if arguments.time is not None or arguments.depth is not None else 1.0
+
+    if arguments.bench:
+        benchmark(time_limit or 1.0)
+        return 0
+
+    position = Position.from_fen(arguments.fen) if arguments.fen else Position.initial()
+    result = search(position, time_limit, arguments.depth, info=print)
+    print(f'bestmove {move_name(result.move) if result.move is not None else "none"}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,335 @@
+'''Simple Chess Game Module
+
+Headless game session over the board core. Imports no display library (only board, movegen, notation and history), so the rules can run
+in worker processes and containers without a display. Frontends such as the tkinter Game in main.pyw subscribe to its events:
+
+    'move'       (record)           Move has been played; record is the UndoRecord of the board
+    'capture'    (square, code)     Piece with the given code has been captured on square
+    'promotion'  (square)           Pawn on square has reached the last row and waits for promote()
+    'promoted'   (square, code)     Pawn on square has been replaced by the piece with the given code
+    'check'      (side)             King of side (0 for white, 1 for black) is in check
+    'game_over'  (result)           Game has ended; result is a description such as 'Draw by threefold repetition'
+    'take_back'  (record)           Move has been taken back; record is the UndoRecord of the board
+    'ply'        (ply)              Number of moves played has changed (move completed, taken back, redone or jumped to)
+    'notation'   (text)             Move has been completed; text is its number and SAN, such as '1. e4' or '1... e5'
+    'setup'      ()                 New position has been set up (new game, FEN or PGN); views are rebuilt from the board
+
+Startup cost can be checked with: python -X importtime -c "import game"'''
+
+from board import Board, HALFMOVE, CODE_KINDS, piece_code
+from movegen import Position, SIDES, WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+from notation import PGNGame, move_to_san, parse_san, format_game
+from history import MoveHistory
+from instrumentation import get_logger, metrics, timed
+
+log = get_logger(__name__)
+
+BACK_ROW = (ROOK, KNIGHT, BISHOP, QUEEN, KING, BISHOP, KNIGHT, ROOK) # Piece types of the first row from column 0 to 7
+EVENTS = ('move', 'capture', 'promotion', 'promoted', 'check', 'game_over', 'take_back', 'ply', 'notation', 'setup') # Names of the events a ChessGame emits
+INITIAL_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1' # FEN of the starting position
+NO_TARGETS = {} # Legal targets of a position where no move can be made (never modified)
+
+class ChessGame:
+    'Game session playing validated moves on a Board and notifying its subscribers'
+
+    __slots__ = ('board', 'subscribers', 'pending_promotion', 'result', 'start', 'history', 'previous', 'targets')
+
+    def __init__(self):
+        self.board = Board() # Compact game state
+        self.subscribers = {event: [] for event in EVENTS} # Callbacks of every event in subscription order
+        self.pending_promotion = None # Square of the pawn waiting to be promoted
+        self.result = None # Description of how the game ended, None while it is in progress
+        self.start = INITIAL_FEN # FEN of the position the game started from
+        self.history = MoveHistory() # Packed moves and SAN of the game, including the moves taken back that can be replayed
+        self.previous = None # Position before the last move, used to write its SAN
+        self.targets = None # Key of the position and its legal targets, computed once per ply
+
+    def subscribe(self, event, callback):
+        'Calls callback with the arguments of event every time it is emitted'
+
+        if event not in self.subscribers:
+            raise ValueError(f'Unknown event {event!r}')
+        self.subscribers[event].append(callback)
+
+    def unsubscribe(self, event, callback):
+        'Stops calling callback for event'
+
+        self.subscribers[event].remove(callback)
+
+    def __emit(self, event, *arguments):
+        'Calls every subscriber of event with the given arguments'
+
+        for callback in self.subscribers[event]:
+            callback(*arguments)
+
+    def new_game(self):
+        'Sets up the starting position'
+
+        self.board.clear()
+        for column, kind in enumerate(BACK_ROW):
+            self.board.place(piece_code(BLACK, kind), column)
+            self.board.place(piece_code(BLACK, PAWN), 8 + column)
+            self.board.place(piece_code(WHITE, PAWN), 48 + column)
+            self.board.place(piece_code(WHITE, kind), 56 + column)
+
+        self.board.record_position() # Records the starting position for repetition detection
+        self.pending_promotion = self.result = self.previous = None # Pawn move waiting for promotion is dropped with the old position
+        self.start, self.targets = INITIAL_FEN, None
+        self.history.clear()
+        self.__emit('setup')
+
+    def load_fen(self, fen):
+        '''Sets up the position described by FEN and emits the setup event
+
+        Raises ValueError if the FEN cannot be read; the FEN is fully checked before the board is changed, so the current game is kept'''
+
+        try:
+            position = Position.from_fen(fen)
+        except (ValueError, IndexError, KeyError) as error:
+            raise ValueError(f'Invalid FEN {fen!r}: {error}') from error
+        if position.squares.count(WHITE << 3 | KING) != 1 or position.squares.count(BLACK << 3 | KING) != 1:
+            raise ValueError(f'Invalid FEN {fen!r}: each side needs exactly one king')
+
+        self.board.set_position(position)
+        self.board.record_position()
+        self.pending_promotion = self.result = self.previous = None # Pawn move waiting for promotion is dropped with the old position
+        self.start, self.targets = position.to_fen(), None
+        self.history.clear()
+        log.info('Loaded FEN %s', self.start)
+        self.__emit('setup')
+        self.__after_move() # Position may already be checkmate or a draw
+
+    def load_game(self, game):
+        '''Sets up the starting position of a PGNGame and plays all its moves
+
+        Raises ValueError naming the first illegal move; the moves before it stay on the board'''
+
+        self.load_fen(game.headers.get('FEN', INITIAL_FEN))
+        position = self.board.to_position()
+        for san in game.moves:
+            try:
+                move = parse_san(position, san)
+            except ValueError as error:
+                raise ValueError(f'{self.fullmove}{"." if position.side == WHITE else "..."} {error}') from None
+            self.play(move & 63, (move >> 6) & 63, (move >> 12) & 7 or None)
+            position.push(move)
+
+    @property
+    def moves(self):
+        'SAN of every move played'
+
+        return self.history.played
+
+    @property
+    def fullmove(self):
+        'Number of the current move (incremented after every black move)'
+
+        fields = self.start.split()
+        return int(fields[5]) + ('wb'.index(fields[1]) + len(self.board.history)) // 2
+
+    def fen(self):
+        'Returns the FEN of the current position'
+
+        position = self.board.to_position()
+        position.fullmove = self.fullmove
+        return position.to_fen()
+
+    def pgn(self, headers=None):
+        '''Returns the PGN text of the game
+
+        Takes a dictionary of extra tag pairs (such as White and Black) as argument'''
+
+        headers = dict(headers or {})
+        if self.start != INITIAL_FEN: # Game set up from a FEN
+            headers['SetUp'], headers['FEN'] = '1', self.start
+
+        if self.result is None:
+            result = '*'
+        elif self.result.startswith('Draw'):
+            result = '1/2-1/2'
+        else:
+            result = '1-0' if self.result.startswith('White') else '0-1'
+        return format_game(PGNGame(headers, self.moves, result))
+
+    def legal_targets(self):
+        '''Returns a dictionary mapping the square of every piece of the side to move that has a legal move to a dictionary mapping
+        each of its destination squares to the square of the piece captured there (NO_SQUARE if nothing is captured)
+
+        Computed once per position and cached by its key until a move is made or taken back; empty while a promotion is pending or once the game has ended'''
+
+        if self.pending_promotion is not None or self.result is not None:
+            return NO_TARGETS
+
+        if self.targets is None or self.targets[0] != self.board.key:
+            self.targets = (self.board.key, self.board.legal_targets())
+        return self.targets[1]
+
+    def legal_move(self, initial, final):
+        '''Returns the square of the piece captured by moving the piece on square initial to final (NO_SQUARE if nothing is captured), or None if the move is illegal
+
+        Only pieces of the side to move may move and no move may be made while a promotion is pending or once the game has ended'''
+
+        return self.legal_targets().get(initial, NO_TARGETS).get(final)
+
+    def play(self, initial, final, promotion=None):
+        '''Plays the move of the piece on square initial to square final and returns its undo record
+
+        A pawn reaching the last row is promoted to the piece type promotion if one is given, otherwise the 'promotion' event is emitted and
+        the game waits for promote(). Raises ValueError if the move is illegal or promotion is not a piece a pawn can become'''
+
+        if self.legal_move(initial, final) is None:
+            log.debug('Rejected move %s to %s', Board.square_positions[initial], Board.square_positions[final])
+            raise ValueError(f'Illegal move {Board.square_positions[initial]} to {Board.square_positions[final]}')
+        if promotion is not None and promotion not in (KNIGHT, BISHOP, ROOK, QUEEN): # Checked before the board is changed
+            raise ValueError(f'No pawn can be promoted to piece type {promotion!r}')
+
+        self.previous = self.board.to_position() # Kept until the move is complete to write its SAN
+        record = self.board.make_move(initial, final)
+        self.targets = None
+        self.__emit('move', record)
+
+        if record.captured:
+            self.__emit('capture', record.captured_square, record.captured)
+
+        if CODE_KINDS[self.board.state[final]] == PAWN and final // 8 in (0, 7): # Pawn has reached end of the board
+            self.pending_promotion = final
+            if promotion is None:
+                self.__emit('promotion', final)
+                return record
+            self.promote(promotion)
+            return record
+
+        self.__after_move()
+        return record
+
+    def promote(self, kind):
+        'Promotes the pawn waiting for promotion to a piece of the given piece type'
+
+        if self.pending_promotion is None or kind not in (KNIGHT, BISHOP, ROOK, QUEEN):
+            raise ValueError('No pawn can be promoted to this piece')
+
+        square, self.pending_promotion = self.pending_promotion, None
+        self.board.promote(kind)
+        self.targets = None
+        self.__emit('promoted', square, self.board.state[square])
+        self.__after_move()
+
+    def take_back(self):
+        '''Takes back the last move and returns its undo record, or None if no move has been made
+
+        The move stays in the history and can be replayed with redo() until another move is played'''
+
+        if not self.board.history:
+            return None
+
+        if self.pending_promotion is not None: # Pawn move is cancelled, it is only written to the history once the promotion has been chosen
+            self.pending_promotion = self.previous = None
+            record = self.board.unmake_move()
+            self.targets = None
+            self.__emit('take_back', record)
+            return record
+
+        record = self.__step(False)
+        self.targets = self.result = None
+        self.__emit('ply', self.history.ply)
+        return record
+
+    def redo(self):
+        'Replays the next move of the history and returns its undo record, or None if there is none'
+
+        if self.pending_promotion is not None or self.history.ply == len(self.history):
+            return None
+
+        self.jump(self.history.ply + 1)
+        return self.board.history[-1]
+
+    def jump(self, ply):
+        '''Takes back or replays the moves of the history until ply moves are played (0 for the starting position)
+
+        Moves are replayed from their packed form without being validated or written again, and only the position reached is checked
+        for the end of the game, so any ply of a long game is reached at once. Raises ValueError if the history has no such ply'''
+
+        if not 0 <= ply <= len(self.history):
+            raise ValueError(f'No ply {ply} in a game of {len(self.history)} moves')
+
+        if self.pending_promotion is not None:
+            self.take_back()
+        if ply == self.history.ply:
+            return
+
+        while self.history.ply > ply:
+            self.__step(False)
+        while self.history.ply < ply:
+            self.__step(True)
+
+        self.targets = self.result = None
+        self.__after_move()
+        self.__emit('ply', ply)
+
+    def __step(self, forward):
+        'Replays the next move of the history (or takes back the last one) with its view events and returns its undo record'
+
+        if not forward:
+            self.history.undo()
+            record = self.board.unmake_move()
+            self.__emit('take_back', record)
+            return record
+
+        move = self.history.redo()
+        record = self.board.make_move(move & 63, (move >> 6) & 63, (move >> 12) & 7 or None)
+        self.__emit('move', record)
+        if record.captured:
+            self.__emit('capture', record.captured_square, record.captured)
+        if record.promoted:
+            self.__emit('promoted', record.final, record.promoted)
+        return record
+
+    def __after_move(self):
+        'Writes the SAN of the move just completed and emits the notation, check and game over events of the position it reached'
+
+        board = self.board
+        if self.previous is not None:
+            record, position, self.previous = board.history[-1], self.previous, None
+            promotion = CODE_KINDS[record.promoted] if record.promoted else 0
+            move = next(move for move in position.legal_moves() if move & 63 == record.initial and (move >> 6) & 63 == record.final and (move >> 12) & 7 == promotion)
+            san = move_to_san(position, move)
+            self.history.push(move, san)
+
+            number = self.fullmove - (board.side == WHITE) # Number of the move just played
+            log.debug('Played %d%s %s', number, '.' if board.side == BLACK else '...', san)
+            self.__emit('notation', f'{number}{"." if board.side == BLACK else "..."} {san}')
+            self.__emit('ply', self.history.ply)
+
+        in_check = board.in_check(board.side)
+        if in_check:
+            self.__emit('check', board.side)
+
+        self.result = self.outcome(in_check)
+        if self.result is not None:
+            log.info('Game over: %s', self.result)
+            self.__emit('game_over', self.result)
+
+    def outcome(self, in_check=None):
+        '''Returns how the game has ended in the current position, or None if it goes on
+
+        Covers checkmate, stalemate, insufficient material, the fifty-move rule and threefold repetition'''
+
+        board = self.board
+        if in_check is None:
+            in_check = board.in_check(board.side)
+
+        if not board.has_legal_move():
+            return f'{SIDES[board.side ^ 1].capitalize()} wins by checkmate' if in_check else 'Draw by stalemate'
+        if board.insufficient_material():
+            return 'Draw by insufficient material'
+        if board.state[HALFMOVE] >= 100: # Fifty moves of each side without a capture or pawn move
+            return 'Draw by fifty-move rule'
+        if board.repetition_count() >= 3: # Same position has occurred three times
+            return 'Draw by threefold repetition'
+        return None
+
+### INSTRUMENTATION (ONLY WRAPPED WHILE METRICS ARE ENABLED)
+
+metrics.instrument(ChessGame, 'legal_move', timed('game.legal_move'))
+metrics.instrument(ChessGame, 'legal_targets', timed('game.legal_targets'))
+metrics.instrument(ChessGame, 'play', timed('game.play'))
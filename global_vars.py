@@ -1,4 +1,7 @@
 '''Simple Chess Constants and Global Variables Module'''
 
 BOARD_SIZE = 640 # Sets the board size
-SQUARE_SIZE = BOARD_SIZE/8 # Sets the chess square size
\ No newline at end of file
+SQUARE_SIZE = BOARD_SIZE/8 # Sets the chess square size
+ENGINE_TIME = 1 # Sets the seconds the computer opponent searches per move
+TARGET_COLOUR = 'seagreen' # Sets the colour of the markers showing where a selected piece can move
+METRICS_FILE = 'metrics.json' # Sets the file the counters and timers are written to when they are turned off (Ctrl+M)
@@ -0,0 +1,58 @@
+'''Simple Chess History Module
+
+Line of moves of a game session. Moves are packed into 16 bits (initial | final << 6 | promotion << 12, the movegen layout without
+the flags) next to their SAN, and a cursor tells how many of them are currently played: taking a move back only moves the cursor,
+so the moves after it can be replayed until a different move is played. The board keeps the undo records of the played moves.'''
+
+from array import array
+
+class MoveHistory:
+    'Packed moves and SAN of a line of play with the number of moves currently played'
+
+    __slots__ = ('moves', 'sans', 'ply')
+
+    def __init__(self):
+        self.moves = array('H') # Packed move of every ply of the line
+        self.sans = [] # SAN of every ply of the line
+        self.ply = 0 # Number of moves currently played; the moves after it have been taken back and can be replayed
+
+    def __len__(self):
+        return len(self.moves)
+
+    @property
+    def played(self):
+        'SAN of the moves currently played'
+
+        return self.sans[:self.ply]
+
+    def clear(self):
+        'Removes every move'
+
+        del self.moves[:]
+        self.sans.clear()
+        self.ply = 0
+
+    def push(self, move, san):
+        'Records a move played at the current ply; the moves taken back after it are dropped'
+
+        del self.moves[self.ply:]
+        del self.sans[self.ply:]
+        self.moves.append(move & 0x7FFF) # Flags are not stored, the board finds out castling and en passant itself
+        self.sans.append(san)
+        self.ply += 1
+
+    def undo(self):
+        'Steps back one move and returns it, or None if no move is played'
+
+        if not self.ply:
+            return None
+        self.ply -= 1
+        return self.moves[self.ply]
+
+    def redo(self):
+        'Steps forward one move and returns it, or None if every move is played'
+
+        if self.ply == len(self.moves):
+            return None
+        self.ply += 1
+        return self.moves[self.ply - 1]
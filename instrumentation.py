@@ -0,0 +1,245 @@
+'''Simple Chess Instrumentation Module
+
+Logging and optional metrics for profiling a session. Every module logs through get_logger(__name__), a child of the 'simple_chess'
+logger configured here, so output can be filtered by level and module. Counters and latency histograms are off by default: enabling
+them wraps the hot methods of the board and game session, so nothing is measured (or slowed down) while they are disabled.
+A snapshot of every counter and histogram can be exported as JSON and compared between sessions to find regressions.
+
+Usage:
+    python instrumentation.py --games 20                     (plays random games with metrics enabled and prints the JSON snapshot)
+    python instrumentation.py --games 20 --output run.json   (writes it to a file instead)'''
+
+import functools
+import logging
+import os
+import sys
+import time
+
+LOGGER_NAME = 'simple_chess' # Parent logger of every module
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+LOG_LEVEL_VARIABLE = 'SIMPLE_CHESS_LOG' # Environment variable holding the log level name (WARNING by default)
+BUCKETS = 24 # Latency histogram buckets: bucket i counts durations below 2**i microseconds, the last one everything slower
+
+def get_logger(name):
+    'Returns the logger of a module below the parent logger (takes the module __name__)'
+
+    return logging.getLogger(f'{LOGGER_NAME}.{name}')
+
+def configure_logging(level=None):
+    'Sends the log records of every module to stderr at the given level name or number (the SIMPLE_CHESS_LOG environment variable by default)'
+
+    level = level or os.environ.get(LOG_LEVEL_VARIABLE, 'WARNING')
+    logger = logging.getLogger(LOGGER_NAME)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        logger.addHandler(handler)
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    return logger
+
+log = get_logger(__name__)
+
+class Histogram:
+    'Count, total, extremes and power-of-two microsecond buckets of the durations of one timer'
+
+    __slots__ = ('count', 'total', 'minimum', 'maximum', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0 # Seconds
+        self.minimum = float('inf')
+        self.maximum = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, seconds):
+        'Records a duration in seconds'
+
+        self.count += 1
+        self.total += seconds
+        self.minimum = min(self.minimum, seconds)
+        self.maximum = max(self.maximum, seconds)
+        self.buckets[min(int(seconds*1e6).bit_length(), BUCKETS - 1)] += 1
+
+    def percentile(self, fraction):
+        'Returns the upper bound in seconds of the bucket holding the given fraction of the durations'
+
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= fraction * self.count:
+                return min((1 << index) * 1e-6, self.maximum)
+        return self.maximum
+
+    def to_dict(self):
+        'Returns the histogram as a dictionary of plain numbers (durations in microseconds)'
+
+        return {
+            'count': self.count,
+            'total_us': round(self.total*1e6, 1),
+            'mean_us': round(self.total/self.count*1e6, 2) if self.count else 0,
+            'min_us': round(self.minimum*1e6, 2) if self.count else 0,
+            'max_us': round(self.maximum*1e6, 2),
+            'p50_us': round(self.percentile(0.5)*1e6, 2),
+            'p99_us': round(self.percentile(0.99)*1e6, 2),
+            'buckets_us': {f'<{1 << index}': count for index, count in enumerate(self.buckets) if count}
+            }
+
+class Metrics:
+    'Counters and latency histograms of a session; methods registered with instrument() are only wrapped while enabled'
+
+    __slots__ = ('enabled', 'counters', 'timers', 'started', 'hooks', 'originals')
+
+    def __init__(self):
+        self.enabled = False
+        self.counters = {} # Name to count
+        self.timers = {} # Name to Histogram
+        self.started = time.time() # Wall clock time of the last reset
+        self.hooks = [] # (class, method name, wrapper factory) of every instrumented method
+        self.originals = {} # Unwrapped attribute of every (class, method name) while enabled
+
+    def count(self, name, amount=1):
+        'Adds amount to a counter'
+
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, seconds):
+        'Records a duration in seconds in the histogram of a timer'
+
+        histogram = self.timers.get(name)
+        if histogram is None:
+            histogram = self.timers[name] = Histogram()
+        histogram.add(seconds)
+
+    def instrument(self, cls, name, factory):
+        '''Registers a method to be wrapped while metrics are enabled
+
+        Takes the class, the method name and a function returning the wrapper of the original method'''
+
+        self.hooks.append((cls, name, factory))
+        if self.enabled:
+            self.__wrap(cls, name, factory)
+
+    def __wrap(self, cls, name, factory):
+        'Replaces a method with its wrapper (static methods stay static) and keeps the original to restore it'
+
+        original = self.originals[cls, name] = cls.__dict__[name]
+        if isinstance(original, staticmethod):
+            setattr(cls, name, staticmethod(factory(original.__func__)))
+        else:
+            setattr(cls, name, factory(original))
+
+    def enable(self):
+        'Starts collecting: wraps every registered method'
+
+        if not self.enabled:
+            self.enabled = True
+            for cls, name, factory in self.hooks:
+                self.__wrap(cls, name, factory)
+            log.info('Metrics enabled')
+
+    def disable(self):
+        'Stops collecting: restores every registered method (the counters are kept until reset)'
+
+        if self.enabled:
+            self.enabled = False
+            for (cls, name), original in self.originals.items():
+                setattr(cls, name, original)
+            self.originals.clear()
+            log.info('Metrics disabled')
+
+    def reset(self):
+        'Clears every counter and histogram'
+
+        self.counters.clear()
+        self.timers.clear()
+        self.started = time.time()
+
+    def snapshot(self):
+        'Returns every counter and histogram as a dictionary that can be written as JSON'
+
+        return {
+            'started': self.started,
+            'duration_s': round(time.time() - self.started, 3),
+            'counters': dict(sorted(self.counters.items())),
+            'timers': {name: histogram.to_dict() for name, histogram in sorted(self.timers.items())}
+            }
+
+    def to_json(self, indent=2):
+        'Returns the snapshot as JSON text'
+
+        import json # Only needed when exporting, the board core imports this module
+
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def dump(self, path):
+        'Writes the snapshot as JSON to a file'
+
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write(self.to_json() + '\n')
+        log.info('Metrics written to %s', path)
+
+metrics = Metrics() # Metrics of the session, shared by every module
+
+def counted(name):
+    'Returns a wrapper factory counting the calls of a method under name'
+
+    def factory(method):
+        @functools.wraps(method)
+        def wrapper(*arguments, **keywords):
+            metrics.count(name)
+            return method(*arguments, **keywords)
+        return wrapper
+    return factory
+
+def timed(name):
+    'Returns a wrapper factory recording the latency of every call of a method in the histogram of name'
+
+    def factory(method):
+        @functools.wraps(method)
+        def wrapper(*arguments, **keywords):
+            start = time.perf_counter()
+            try:
+                return method(*arguments, **keywords)
+            finally:
+                metrics.observe(name, time.perf_counter() - start)
+        return wrapper
+    return factory
+
+### COMMAND LINE
+
+def main(arguments=None):
+    'Command line entry point; returns the process exit code'
+
+    import argparse
+    import random
+
+    parser = argparse.ArgumentParser(description='Plays random games through the game session with metrics enabled and exports the snapshot as JSON')
+    parser.add_argument('--games', type=int, default=10, help='number of games (default 10)')
+    parser.add_argument('--plies', type=int, default=200, help='longest game in plies (default 200)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random moves')
+    parser.add_argument('--output', help='JSON file to write (prints to stdout by default)')
+    parser.add_argument('--log', default='WARNING', help='log level (default WARNING)')
+    arguments = parser.parse_args(arguments)
+
+    configure_logging(arguments.log)
+    from game import ChessGame # Registers the instrumented methods of the board and the game session
+    from instrumentation import metrics # Instance the other modules registered with (this file runs as __main__)
+
+    rng = random.Random(arguments.seed)
+    game = ChessGame()
+    metrics.enable()
+    for _ in range(arguments.games):
+        game.new_game()
+        while game.result is None and len(game.moves) < arguments.plies:
+            initial, targets = rng.choice(sorted(game.legal_targets().items()))
+            game.play(initial, rng.choice(sorted(targets)), rng.choice((1, 2, 3, 4)))
+    metrics.disable()
+
+    if arguments.output:
+        metrics.dump(arguments.output)
+    else:
+        print(metrics.to_json())
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,23 +1,38 @@
 '''Simple Chess Main Module'''
 
 from piece_classes import * # Imports all the piece classes (including constants.py)
+from analysis import AnalysisPool, POLL_INTERVAL # Runs the computer opponent in worker processes
+from notation import read_games # Reads games pasted as PGN
+from rendering import BoardRenderer # Persistent canvas items and drags redrawn once per frame
+from instrumentation import configure_logging, get_logger # Log records of every module, filtered by level
 
-from PIL import ImageTk, Image # Image processing library
+log = get_logger(__name__)
 
 ### DEFINING THE ROOT (MUST BE DEFINED BEFORE PHOTOIMAGE OBJECT IS CREATED)
 
-root = tkinter.Tk() # Defines main window
-root.title('Simple Chess') # Sets window title
-root.iconbitmap(r'resources/chess_icon.ico') # Sets window icon
-root.resizable('False', 'False') # Disables window resizing
+def create_root():
+    '''Creates and returns the main window along with the images used by the widgets
 
-chess_img = Image.open(r'resources\chess_img.png') # Opens the image
-chess_img = chess_img.resize((150, 150), Image.ANTIALIAS) # Resizes the opened photo before converting it into a PhotoImage
-chess_img = ImageTk.PhotoImage(chess_img) # Converts image into a PhotoImage
+    PIL and the window are only loaded when the GUI is started, importing the rules does not need a display'''
 
-reset_arrow = Image.open(r'resources\reset_arrow.png')
-reset_arrow = reset_arrow.resize((90, 70), Image.ANTIALIAS)
-reset_arrow = ImageTk.PhotoImage(reset_arrow)
+    global chess_img, reset_arrow
+
+    from PIL import ImageTk, Image # Image processing library
+
+    root = tkinter.Tk() # Defines main window
+    root.title('Simple Chess') # Sets window title
+    root.iconbitmap(r'resources/chess_icon.ico') # Sets window icon
+    root.resizable('False', 'False') # Disables window resizing
+
+    chess_img = Image.open(r'resources\chess_img.png') # Opens the image
+    chess_img = chess_img.resize((150, 150), Image.ANTIALIAS) # Resizes the opened photo before converting it into a PhotoImage
+    chess_img = ImageTk.PhotoImage(chess_img) # Converts image into a PhotoImage
+
+    reset_arrow = Image.open(r'resources\reset_arrow.png')
+    reset_arrow = reset_arrow.resize((90, 70), Image.ANTIALIAS)
+    reset_arrow = ImageTk.PhotoImage(reset_arrow)
+
+    return root
 
 ### MAIN CLASS
 
@@ -29,7 +44,40 @@ class Game:
 
         self.__widgets() # Creates all widgets
         self.__draw_board() # Draws the chess board
-        self.__create_pieces() # Creates all the piece instances
+        self.renderer = BoardRenderer(self.chess_board) # Highlight box and target markers, drawn above the squares
+
+        self.parent.bind('<Control-z>', lambda event: self.__take_back()) # Takes back the last move
+        self.parent.bind('<Control-y>', lambda event: Piece.game.redo()) # Replays the last move taken back
+        self.parent.bind('<Control-e>', lambda event: self.__computer_move()) # Lets the computer play the side to move
+        self.parent.bind('<Control-c>', lambda event: self.__copy(Piece.game.fen())) # Copies the FEN of the position
+        self.parent.bind('<Control-C>', lambda event: self.__copy(Piece.game.pgn())) # Copies the PGN of the game (Ctrl+Shift+C)
+        self.parent.bind('<Control-v>', lambda event: self.__paste()) # Loads a FEN or PGN from the clipboard
+        self.parent.bind('<Control-d>', lambda event: self.__toggle_drag_stats()) # Shows the event handling latency of every drag
+        self.parent.bind('<Control-m>', lambda event: self.__toggle_metrics()) # Collects counters and timers of the rules, written to METRICS_FILE when turned off
+
+        Piece.game.subscribe('setup', self.__position_set) # Rebuilds the views and clears the move tracker
+        Piece.game.subscribe('notation', self.__move_written) # Lists every move in SAN
+        Piece.game.subscribe('ply', self.__ply_changed) # Selects the last move played in the move list
+
+        for event in ('setup', 'ply'): # Legal targets of the new position are computed once per ply, as soon as the window is idle
+            Piece.game.subscribe(event, lambda *arguments: self.parent.after_idle(Piece.game.legal_targets))
+
+        Piece.game.subscribe('move', Piece.move_made) # Moves the views of the pieces
+        Piece.game.subscribe('promoted', Piece.piece_promoted)
+        Piece.game.subscribe('take_back', Piece.move_taken_back)
+        Piece.game.subscribe('promotion', lambda square: Piece.views[square].promote()) # Enables the promotion buttons
+        Piece.game.subscribe('game_over', lambda result: self.win_label.config(text=result)) # Shows checkmate or the kind of draw
+        Piece.game.subscribe('take_back', lambda record: self.win_label.config(text='')) # Game goes on once the final move is taken back
+
+        self.analysis = AnalysisPool() # Searches positions off the main loop
+        self.computer_job = None # Job number of the analysis whose best move will be played
+        Piece.game.subscribe('move', lambda record: self.__cancel_analysis()) # Searches of an older position are cancelled when a move is made
+        Piece.game.subscribe('take_back', lambda record: self.__cancel_analysis())
+
+        self.parent.protocol('WM_DELETE_WINDOW', self.__close) # Stops the worker processes with the window
+        self.parent.after(POLL_INTERVAL, self.__poll_analysis) # Starts polling the analysis updates
+
+        self.__create_pieces() # Creates all the piece instances once the setup event is subscribed
 
     ### PACKING WIDGETS
 
@@ -52,15 +100,20 @@ class Game:
 
         self.right_frame = tkinter.Frame(self.parent, bg='lightpink', width=300, height=300)
         self.imageLabel = tkinter.Label(self.right_frame, image=chess_img, relief='solid', bd=2, bg='yellow') # Label with the image
-        self.move_tracker = tkinter.Listbox(self.right_frame, selectmode=tkinter.SINGLE, width=40, height=23) # Chess move tracker
-        self.reset_button = tkinter.Button(self.right_frame, image=reset_arrow, relief='flat', state=tkinter.DISABLED, command=self.__reset) # Reset button
-        self.win_label = tkinter.Label(self.right_frame, text='White wins by checkmate') # Label that displays who has won the game
+        self.move_tracker = tkinter.Listbox(self.right_frame, selectmode=tkinter.SINGLE, exportselection=False, width=40, height=23) # Chess move tracker
+        self.move_tracker.bind('<<ListboxSelect>>', lambda event: self.__move_selected()) # Jumps to the position after the clicked move
+        self.reset_button = tkinter.Button(self.right_frame, image=reset_arrow, relief='flat', command=self.__reset) # Reset button
+        self.win_label = tkinter.Label(self.right_frame, text='') # Label that displays who has won the game
+        self.computer_button = tkinter.Button(self.right_frame, text='Computer move', command=self.__computer_move) # Lets the computer play the side to move
+        self.analysis_label = tkinter.Label(self.right_frame, text='') # Shows depth, score, best move and nodes/s of the running search
 
         self.right_frame.grid(row=0, column=1)
         self.imageLabel.grid(row=0, column=0, columnspan=2, pady=(10,0))
         self.move_tracker.grid(row=1, column=0, columnspan=2, padx=10, pady=10)
         self.reset_button.grid(row=2, column=1)
         self.win_label.grid(row=3, column=0, columnspan=2, pady=(0,10))
+        self.computer_button.grid(row=4, column=0, columnspan=2, pady=(0,10))
+        self.analysis_label.grid(row=5, column=0, columnspan=2, pady=(0,10))
 
         ### ### PROMOTION BUTTONS LABEL FRAME
         self.promotion_buttons_frame = tkinter.LabelFrame(self.right_frame, text='Promotion') # Promotion button label frame containing all the promotion buttons
@@ -88,41 +141,157 @@ class Game:
     def __create_pieces(self):
         'Creates all chess pieces'
 
-        for i in range(8): # Creates the pawns
-            position = f'{i}1'
-            Pawn('black', position, self)
-        for i in range(8):
-            position = f'{i}6'
-            Pawn('white', position, self)
-        
-        Rook('black', '00', self) # Creates the rooks 
-        Rook('black', '70', self)
-        Rook('white', '07', self)
-        Rook('white', '77', self)
-
-        Knight('black', '10', self) # Creates the knights
-        Knight('black', '60', self)
-        Knight('white', '17', self)
-        Knight('white', '67', self)
-
-        Bishop('black', '20', self) # Creates the bishops
-        Bishop('black', '50', self)
-        Bishop('white', '27', self)
-        Bishop('white', '57', self)
-
-        Queen('black', '30', self) # Creates the queens
-        Queen('white', '37', self)
-        
-        King('black', '40', self) # Creates the kings
-        King('white', '47', self)
+        Piece.game.new_game() # Sets up the starting position on the board core, the views are created by __position_set
+
+    def __position_set(self):
+        'Rebuilds the views and resets the widgets after a new position has been set up'
+
+        self.__cancel_analysis()
+        Piece.position_set(self)
+
+        self.move_tracker.delete(0, tkinter.END)
+        self.win_label.config(text='')
+        self.chess_board.config(state=tkinter.NORMAL)
+        for button in self.promotion_button_list:
+            button.config(state=tkinter.DISABLED)
+
+    def __move_written(self, text):
+        'Adds a move to the move list, replacing the moves that had been taken back after it'
+
+        self.move_tracker.delete(Piece.game.history.ply - 1, tkinter.END)
+        self.move_tracker.insert(tkinter.END, text)
+
+    def __ply_changed(self, ply):
+        'Selects the last move played in the move list (nothing at the starting position)'
+
+        self.move_tracker.selection_clear(0, tkinter.END)
+        if ply:
+            self.move_tracker.selection_set(ply - 1)
+            self.move_tracker.see(ply - 1)
+
+    def __move_selected(self):
+        'Jumps to the position after the move selected in the move list'
+
+        selection = self.move_tracker.curselection()
+        if selection:
+            self.__jump(selection[0] + 1)
+
+    def __jump(self, ply):
+        'Takes back or replays moves of the game until ply moves are played; a pending promotion is cancelled'
+
+        Piece.game.jump(ply)
+        self.chess_board.config(state=tkinter.NORMAL)
+        for button in self.promotion_button_list:
+            button.config(state=tkinter.DISABLED)
+
+    def __toggle_drag_stats(self):
+        'Shows or stops showing the handler time and frame delay of every drag in the analysis label'
+
+        if self.renderer.report is None:
+            self.renderer.report = lambda stats: self.analysis_label.config(text=str(stats))
+            self.analysis_label.config(text='Drag timing on')
+        else:
+            self.renderer.report = None
+            self.analysis_label.config(text='')
+
+    def __toggle_metrics(self):
+        'Starts collecting the counters and timers of the rules, or stops and writes them to METRICS_FILE'
+
+        if not metrics.enabled:
+            metrics.reset()
+            metrics.enable()
+            self.analysis_label.config(text='Metrics on')
+        else:
+            metrics.disable()
+            try:
+                metrics.dump(METRICS_FILE)
+            except OSError as error:
+                log.error('Could not write %s: %s', METRICS_FILE, error)
+                self.analysis_label.config(text=str(error))
+            else:
+                self.analysis_label.config(text=f'Metrics written to {METRICS_FILE}')
+
+    def __copy(self, text):
+        'Puts text on the clipboard'
+
+        self.parent.clipboard_clear()
+        self.parent.clipboard_append(text)
+
+    def __paste(self):
+        'Loads the FEN or PGN on the clipboard; the current game is kept if it cannot be read'
+
+        try:
+            text = self.parent.clipboard_get().strip()
+        except tkinter.TclError: # Clipboard is empty or holds no text
+            return
+
+        try:
+            if text.startswith('[') or text[:2] == '1.': # PGN tag pairs or movetext
+                game = next(read_games(text.splitlines()), None)
+                if game is not None:
+                    Piece.game.load_game(game)
+            else:
+                Piece.game.load_fen(text)
+        except ValueError as error:
+            log.warning('Could not load the clipboard: %s', error)
+            self.win_label.config(text=str(error))
+
+    def __take_back(self):
+        'Takes back the last move'
+
+        if Piece.take_back(): # A pending promotion is cancelled together with the pawn move
+            self.chess_board.config(state=tkinter.NORMAL)
+            for button in self.promotion_button_list:
+                button.config(state=tkinter.DISABLED)
+
+    def __computer_move(self):
+        'Starts searching the position for ENGINE_TIME seconds in the background; the best move is played by __poll_analysis'
+
+        if Piece.game.pending_promotion is not None or Piece.game.result is not None or self.computer_job is not None: # Promotion must be chosen first, the game has ended, or the computer is already thinking
+            return
+
+        self.computer_job = self.analysis.start(Piece.board.snapshot(), ENGINE_TIME)
+        self.analysis_label.config(text='Thinking...')
+
+    def __poll_analysis(self):
+        'Shows the updates of the running search and plays the best move once the computer has finished thinking'
+
+        try:
+            for result, final in self.analysis.poll():
+                self.analysis_label.config(text=str(result)) # Reports depth reached, score and nodes/s
+
+                if final and self.computer_job == self.analysis.job: # Computer has finished thinking
+                    self.computer_job = None
+                    if result.move is not None: # Played through the same path as a move dropped on the canvas
+                        Piece.game.play(result.move & 63, (result.move >> 6) & 63, (result.move >> 12) & 7 or None)
+        except Exception as error: # Search has failed in its worker process (logged by the pool), the computer can be asked again
+            self.computer_job = None
+            self.analysis_label.config(text=f'Computer move failed: {error}')
+        finally:
+            self.parent.after(POLL_INTERVAL, self.__poll_analysis) # Keeps polling whatever happened to this search
+
+    def __cancel_analysis(self):
+        'Cancels the running search, its position is no longer on the board'
+
+        self.analysis.cancel()
+        self.computer_job = None
+
+    def __close(self):
+        'Stops the worker processes and closes the window'
+
+        self.analysis.close()
+        self.parent.destroy()
 
     def __reset(self):
-        'Resets the game'
+        'Goes back to the starting position; the moves stay in the move list and can be replayed'
 
-        pass
+        self.__jump(0)
 
 ### WINDOW INSTANCE CREATED
 
-Game(root) # Creates window
+if __name__ == '__main__':
+    configure_logging() # Level read from the SIMPLE_CHESS_LOG environment variable
+    root = create_root()
+    Game(root) # Creates window
 
-tkinter.mainloop()
\ No newline at end of file
+    tkinter.mainloop()
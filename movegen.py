@@ -0,0 +1,481 @@
+'''Simple Chess Bitboard Move Generator Module
+
+Headless legal move generator; positions are stored as one 64 bit integer per piece type and side.
+Squares are numbered row*8 + column like the colrow position strings of the GUI (square 0 is the top left corner, white moves upwards)'''
+
+from zobrist import PIECE_KEYS, SIDE_KEY, CASTLING_KEYS, en_passant_key, position_key
+
+### CONSTANTS
+
+WHITE, BLACK = 0, 1 # Side indexes
+SIDES = ('white', 'black') # Side names used by the piece classes
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6) # Piece type indexes
+PAWN_CODES = (WHITE << 3 | PAWN, BLACK << 3 | PAWN) # Piece codes of a pawn of each side in Position.squares
+IDENTIFIERS = ('', 'N', 'B', 'R', 'Q', 'K') # Piece identifiers used by the piece classes, indexed by piece type
+
+NORMAL, DOUBLE_PUSH, EN_PASSANT, CASTLING = range(4) # Move flags
+
+WHITE_SHORT, WHITE_LONG, BLACK_SHORT, BLACK_LONG = 1, 2, 4, 8 # Castling right bits
+ALL_CASTLING = 15
+
+FULL = (1 << 64) - 1 # Bitboard with every square set
+FILE_A = sum(1 << (row*8) for row in range(8)) # Bitboard of the leftmost column
+FILE_H = FILE_A << 7 # Bitboard of the rightmost column
+TOP_ROW = 0xFF # Row 0, where white pawns promote
+BOTTOM_ROW = 0xFF << 56 # Row 7, where black pawns promote
+
+PROMOTIONS = (QUEEN, ROOK, BISHOP, KNIGHT) # Piece types a pawn can be promoted to
+
+### LOOKUP TABLES (BUILT ONCE AT IMPORT)
+
+def _offset_table(offsets):
+    'Returns a list of 64 bitboards containing the squares reachable from every square with the given column and row offsets'
+
+    table = []
+    for square in range(64):
+        column, row = square % 8, square // 8
+        bitboard = 0
+        for column_offset, row_offset in offsets:
+            if 0 <= column+column_offset < 8 and 0 <= row+row_offset < 8:
+                bitboard |= 1 << ((row+row_offset)*8 + column+column_offset)
+        table.append(bitboard)
+    return table
+
+KNIGHT_ATTACKS = _offset_table(((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2))) # Squares attacked by a knight on every square
+KING_ATTACKS = _offset_table(((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1))) # Squares attacked by a king on every square
+PAWN_ATTACKS = (_offset_table(((-1, -1), (1, -1))), _offset_table(((-1, 1), (1, 1)))) # Squares attacked by a pawn of each side on every square
+
+DIRECTIONS = ((1, 0), (0, 1), (1, 1), (-1, 1), (-1, 0), (0, -1), (1, -1), (-1, -1)) # Slider directions; the first four increase the square index, the last four decrease it
+LINEAR_DIRECTIONS = (0, 1, 4, 5) # Indexes of the rook directions in DIRECTIONS
+DIAGONAL_DIRECTIONS = (2, 3, 6, 7) # Indexes of the bishop directions in DIRECTIONS
+
+def _ray_table(column_offset, row_offset):
+    'Returns a list of 64 bitboards containing every square on the ray leaving each square in one direction'
+
+    table = []
+    for square in range(64):
+        column, row = square % 8 + column_offset, square // 8 + row_offset
+        bitboard = 0
+        while 0 <= column < 8 and 0 <= row < 8:
+            bitboard |= 1 << (row*8 + column)
+            column += column_offset
+            row += row_offset
+        table.append(bitboard)
+    return table
+
+RAYS = [_ray_table(*direction) for direction in DIRECTIONS] # Rays leaving every square, indexed by direction then square
+
+CASTLING_MOVES = {
+        62: (WHITE_SHORT, 63, 61, (1 << 61) | (1 << 62), (61,)),
+        58: (WHITE_LONG, 56, 59, (1 << 57) | (1 << 58) | (1 << 59), (59,)),
+        6: (BLACK_SHORT, 7, 5, (1 << 5) | (1 << 6), (5,)),
+        2: (BLACK_LONG, 0, 3, (1 << 1) | (1 << 2) | (1 << 3), (3,))
+        } # Maps the king destination of each castling move to its right, rook initial and final square, squares that must be empty and square the king crosses
+
+CASTLING_MASKS = [ALL_CASTLING] * 64 # Castling rights kept when a piece moves from or to each square
+CASTLING_MASKS[60] &= ~(WHITE_SHORT | WHITE_LONG)
+CASTLING_MASKS[63] &= ~WHITE_SHORT
+CASTLING_MASKS[56] &= ~WHITE_LONG
+CASTLING_MASKS[4] &= ~(BLACK_SHORT | BLACK_LONG)
+CASTLING_MASKS[7] &= ~BLACK_SHORT
+CASTLING_MASKS[0] &= ~BLACK_LONG
+
+def rook_attacks(square, occupied):
+    'Returns the bitboard of squares attacked by a rook on square given the occupied squares'
+
+    return _slider_attacks(square, occupied, LINEAR_DIRECTIONS)
+
+def bishop_attacks(square, occupied):
+    'Returns the bitboard of squares attacked by a bishop on square given the occupied squares'
+
+    return _slider_attacks(square, occupied, DIAGONAL_DIRECTIONS)
+
+def _slider_attacks(square, occupied, directions):
+    'Cuts every ray at its first blocker (lowest set bit for increasing directions, highest for decreasing ones)'
+
+    attacks = 0
+    for direction in directions:
+        ray = RAYS[direction][square]
+        blockers = ray & occupied
+        if blockers:
+            if direction < 4:
+                first = (blockers & -blockers).bit_length() - 1
+            else:
+                first = blockers.bit_length() - 1
+            ray ^= RAYS[direction][first] # Removes every square behind the first blocker
+        attacks |= ray
+    return attacks
+
+### MOVE ENCODING
+
+def encode_move(initial, final, promotion=0, flag=NORMAL):
+    'Packs a move into an integer; promotion is the piece type the pawn becomes (0 for no promotion)'
+
+    return initial | (final << 6) | (promotion << 12) | (flag << 15)
+
+def square_name(square):
+    'Returns the algebraic name of a square, such as e2'
+
+    return 'abcdefgh'[square % 8] + str(8 - square//8)
+
+def move_name(move):
+    'Returns the coordinate notation of a move, such as e2e4 or e7e8q'
+
+    promotion = (move >> 12) & 7
+    return square_name(move & 63) + square_name((move >> 6) & 63) + ('nbrq'[promotion-1] if promotion else '')
+
+### POSITION
+
+class Position:
+    'Chess position stored as bitboards, with in place push and pop of moves'
+
+    __slots__ = ('pieces', 'occupied', 'squares', 'side', 'castling', 'en_passant', 'halfmove', 'fullmove', 'history', 'key')
+
+    def __init__(self):
+        self.pieces = [[0] * 6, [0] * 6] # Bitboard of every piece type, indexed by side then piece type
+        self.occupied = [0, 0] # Bitboard of all the pieces of each side
+        self.squares = [None] * 64 # Piece on every square as (side << 3) | piece type, or None if the square is empty
+        self.side = WHITE # Side to move
+        self.castling = 0 # Castling right bits
+        self.en_passant = None # Square behind a pawn that has just been pushed twice
+        self.halfmove = 0 # Moves since the last capture or pawn move
+        self.fullmove = 1 # Move number
+        self.history = [] # Undo records of the pushed moves
+        self.key = 0 # Zobrist key of the position, updated incrementally by push and pop
+
+    @classmethod
+    def initial(cls):
+        'Returns the starting position set up by Game.__create_pieces'
+
+        position = cls()
+        for column, kind in enumerate((ROOK, KNIGHT, BISHOP, QUEEN, KING, BISHOP, KNIGHT, ROOK)):
+            position.put(BLACK, kind, column)
+            position.put(BLACK, PAWN, 8 + column)
+            position.put(WHITE, PAWN, 48 + column)
+            position.put(WHITE, kind, 56 + column)
+        position.castling = ALL_CASTLING
+        position.key = position.compute_key()
+        return position
+
+    @classmethod
+    def from_fen(cls, fen):
+        'Returns the position described by a FEN string; raises ValueError if the string cannot be parsed'
+
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ValueError(f'Invalid FEN: {fen!r}')
+
+        position = cls()
+        rows = fields[0].split('/')
+        if len(rows) != 8:
+            raise ValueError(f'Invalid FEN board: {fields[0]!r}')
+
+        for row, text in enumerate(rows): # FEN starts from rank 8, which is row 0
+            column = 0
+            for character in text:
+                if character.isdigit():
+                    column += int(character)
+                elif character.lower() in 'pnbrqk' and column < 8:
+                    position.put(WHITE if character.isupper() else BLACK, 'pnbrqk'.index(character.lower()), row*8 + column)
+                    column += 1
+                else:
+                    raise ValueError(f'Invalid FEN board: {fields[0]!r}')
+            if column != 8:
+                raise ValueError(f'Invalid FEN board: {fields[0]!r}')
+
+        if fields[1] not in ('w', 'b'):
+            raise ValueError(f'Invalid FEN side to move: {fields[1]!r}')
+        position.side = WHITE if fields[1] == 'w' else BLACK
+
+        for character, right, king_square, rook_square in zip('KQkq', (WHITE_SHORT, WHITE_LONG, BLACK_SHORT, BLACK_LONG), (60, 60, 4, 4), (63, 56, 7, 0)):
+            side = WHITE if character.isupper() else BLACK
+            if character in fields[2] and position.squares[king_square] == (side << 3) | KING and position.squares[rook_square] == (side << 3) | ROOK: # Rights without their king and rook in place are ignored
+                position.castling |= right
+
+        if fields[3] != '-': # Square behind a pawn of the other side that has just been pushed twice
+            rank = '6' if position.side == WHITE else '3'
+            if len(fields[3]) != 2 or fields[3][0] not in 'abcdefgh' or fields[3][1] != rank:
+                raise ValueError(f'Invalid FEN en passant square: {fields[3]!r}')
+            square = (8 - int(rank))*8 + 'abcdefgh'.index(fields[3][0])
+            pushed = square + 8 if position.side == WHITE else square - 8
+            if position.squares[pushed] != (position.side ^ 1) << 3 | PAWN:
+                raise ValueError(f'Invalid FEN en passant square: {fields[3]!r} has no pushed pawn')
+            position.en_passant = square
+
+        if len(fields) >= 6:
+            position.halfmove, position.fullmove = int(fields[4]), int(fields[5])
+            if position.halfmove < 0 or position.fullmove < 1:
+                raise ValueError(f'Invalid FEN move counters: {fields[4]} {fields[5]}')
+        position.key = position.compute_key()
+        return position
+
+    def to_fen(self):
+        'Returns the FEN string describing the position'
+
+        rows = []
+        for row in range(8):
+            text, empty = '', 0
+            for code in self.squares[row*8:row*8 + 8]:
+                if code is None:
+                    empty += 1
+                    continue
+                if empty:
+                    text += str(empty)
+                    empty = 0
+                letter = 'pnbrqk'[code & 7]
+                text += letter.upper() if code >> 3 == WHITE else letter
+            rows.append(text + (str(empty) if empty else ''))
+
+        castling = ''.join(character for character, right in zip('KQkq', (WHITE_SHORT, WHITE_LONG, BLACK_SHORT, BLACK_LONG)) if self.castling & right) or '-'
+        en_passant = square_name(self.en_passant) if self.en_passant is not None else '-'
+        return f'{"/".join(rows)} {"wb"[self.side]} {castling} {en_passant} {self.halfmove} {self.fullmove}'
+
+    def put(self, side, kind, square):
+        'Places a piece of the given side and type on an empty square'
+
+        bit = 1 << square
+        self.pieces[side][kind] |= bit
+        self.occupied[side] |= bit
+        self.squares[square] = (side << 3) | kind
+
+    def compute_key(self):
+        'Returns the Zobrist key of the position computed from scratch'
+
+        return position_key(self.squares, self.side, self.castling, self.en_passant)
+
+    def king_square(self, side):
+        'Returns the square of the king of the given side'
+
+        return self.pieces[side][KING].bit_length() - 1
+
+    def is_attacked(self, square, side):
+        'Returns True or False depending on whether any piece of the given side attacks square'
+
+        pieces = self.pieces[side]
+        if KNIGHT_ATTACKS[square] & pieces[KNIGHT] or KING_ATTACKS[square] & pieces[KING] or PAWN_ATTACKS[side ^ 1][square] & pieces[PAWN]:
+            return True
+
+        occupied = self.occupied[0] | self.occupied[1]
+        rooks = pieces[ROOK] | pieces[QUEEN]
+        if rooks and rook_attacks(square, occupied) & rooks:
+            return True
+        bishops = pieces[BISHOP] | pieces[QUEEN]
+        return bool(bishops and bishop_attacks(square, occupied) & bishops)
+
+    def in_check(self):
+        'Returns True or False depending on whether the side to move is in check'
+
+        return self.is_attacked(self.king_square(self.side), self.side ^ 1)
+
+    ### MOVE GENERATION
+
+    def pseudo_legal_moves(self):
+        'Yields every move of the side to move without checking whether it leaves its own king in check'
+
+        side = self.side
+        pieces = self.pieces[side]
+        own = self.occupied[side]
+        enemy = self.occupied[side ^ 1]
+        occupied = own | enemy
+        empty = ~occupied & FULL
+
+        ### PAWNS
+
+        pawns = pieces[PAWN]
+        if side == WHITE:
+            pushes = (pawns >> 8) & empty
+            doubles = ((pushes & (0xFF << 40)) >> 8) & empty
+            left = ((pawns & ~FILE_A) >> 9) & enemy
+            right = ((pawns & ~FILE_H) >> 7) & enemy
+            push_shift, double_shift, left_shift, right_shift = 8, 16, 9, 7
+            promotion_row = TOP_ROW
+        else:
+            pushes = (pawns << 8) & empty
+            doubles = ((pushes & (0xFF << 16)) << 8) & empty
+            left = ((pawns & ~FILE_A) << 7) & enemy
+            right = ((pawns & ~FILE_H) << 9) & enemy
+            push_shift, double_shift, left_shift, right_shift = -8, -16, -7, -9
+            promotion_row = BOTTOM_ROW
+
+        for targets, shift in ((pushes, push_shift), (left, left_shift), (right, right_shift)):
+            while targets:
+                bit = targets & -targets
+                targets ^= bit
+                final = bit.bit_length() - 1
+                if bit & promotion_row:
+                    for promotion in PROMOTIONS:
+                        yield encode_move(final + shift, final, promotion)
+                else:
+                    yield encode_move(final + shift, final)
+
+        while doubles:
+            bit = doubles & -doubles
+            doubles ^= bit
+            final = bit.bit_length() - 1
+            yield encode_move(final + double_shift, final, 0, DOUBLE_PUSH)
+
+        if self.en_passant is not None:
+            attackers = PAWN_ATTACKS[side ^ 1][self.en_passant] & pawns # Pawns standing diagonally behind the en passant square
+            while attackers:
+                bit = attackers & -attackers
+                attackers ^= bit
+                yield encode_move(bit.bit_length() - 1, self.en_passant, 0, EN_PASSANT)
+
+        ### PIECES
+
+        for kind in (KNIGHT, BISHOP, ROOK, QUEEN, KING):
+            bitboard = pieces[kind]
+            while bitboard:
+                bit = bitboard & -bitboard
+                bitboard ^= bit
+                initial = bit.bit_length() - 1
+
+                if kind == KNIGHT:
+                    targets = KNIGHT_ATTACKS[initial]
+                elif kind == BISHOP:
+                    targets = bishop_attacks(initial, occupied)
+                elif kind == ROOK:
+                    targets = rook_attacks(initial, occupied)
+                elif kind == QUEEN:
+                    targets = rook_attacks(initial, occupied) | bishop_attacks(initial, occupied)
+                else:
+                    targets = KING_ATTACKS[initial]
+
+                targets &= ~own
+                while targets:
+                    target = targets & -targets
+                    targets ^= target
+                    yield encode_move(initial, target.bit_length() - 1)
+
+        ### CASTLING
+
+        rights = self.castling & ((WHITE_SHORT | WHITE_LONG) if side == WHITE else (BLACK_SHORT | BLACK_LONG))
+        if rights:
+            king = self.king_square(side)
+            for final, (right, _, _, between, crossed) in CASTLING_MOVES.items():
+                if rights & right and not between & occupied:
+                    if not self.is_attacked(king, side ^ 1) and not any(self.is_attacked(square, side ^ 1) for square in crossed):
+                        yield encode_move(king, final, 0, CASTLING) # Landing on an attacked square is rejected by the legality test
+
+    def legal_moves_iter(self):
+        'Yields every legal move of the side to move, so callers can stop at the first one they need'
+
+        side = self.side
+        for move in self.pseudo_legal_moves():
+            self.push(move)
+            if not self.is_attacked(self.king_square(side), side ^ 1): # Own king is not left in check
+                self.pop()
+                yield move
+            else:
+                self.pop()
+
+    def legal_moves(self):
+        'Returns a list of every legal move of the side to move (including castling, en passant and promotion)'
+
+        return list(self.legal_moves_iter())
+
+    ### MAKING MOVES
+
+    def push(self, move):
+        'Plays a move (as returned by the move generator) on the position'
+
+        initial = move & 63
+        final = (move >> 6) & 63
+        promotion = (move >> 12) & 7
+        flag = move >> 15
+
+        side = self.side
+        enemy = side ^ 1
+        squares = self.squares
+        own_pieces = self.pieces[side]
+        kind = squares[initial] & 7
+
+        captured_square = final
+        if flag == EN_PASSANT:
+            captured_square = final + 8 if side == WHITE else final - 8 # Pushed pawn stands behind the en passant square
+        captured = squares[captured_square]
+
+        self.history.append((move, captured, self.castling, self.en_passant, self.halfmove, self.key))
+        key = self.key ^ SIDE_KEY ^ CASTLING_KEYS[self.castling] ^ en_passant_key(squares, self.en_passant, PAWN_CODES) # Pieces have not moved yet
+
+        if captured is not None: # Removes the captured piece
+            key ^= PIECE_KEYS[enemy][captured & 7][captured_square]
+            bit = 1 << captured_square
+            self.pieces[enemy][captured & 7] ^= bit
+            self.occupied[enemy] ^= bit
+            squares[captured_square] = None
+
+        initial_bit, final_bit = 1 << initial, 1 << final
+        own_pieces[kind] ^= initial_bit
+        self.occupied[side] ^= initial_bit | final_bit
+        squares[initial] = None
+        if promotion:
+            own_pieces[promotion] |= final_bit
+            squares[final] = (side << 3) | promotion
+        else:
+            own_pieces[kind] |= final_bit
+            squares[final] = (side << 3) | kind
+        key ^= PIECE_KEYS[side][kind][initial] ^ PIECE_KEYS[side][promotion or kind][final]
+
+        if flag == CASTLING: # Moves the rook next to the king
+            _, rook_initial, rook_final, _, _ = CASTLING_MOVES[final]
+            rook_bits = (1 << rook_initial) | (1 << rook_final)
+            own_pieces[ROOK] ^= rook_bits
+            self.occupied[side] ^= rook_bits
+            squares[rook_final] = squares[rook_initial]
+            squares[rook_initial] = None
+            key ^= PIECE_KEYS[side][ROOK][rook_initial] ^ PIECE_KEYS[side][ROOK][rook_final]
+
+        self.castling &= CASTLING_MASKS[initial] & CASTLING_MASKS[final]
+        self.en_passant = (initial + final) // 2 if flag == DOUBLE_PUSH else None
+        self.key = key ^ CASTLING_KEYS[self.castling] ^ en_passant_key(squares, self.en_passant, PAWN_CODES)
+        self.halfmove = 0 if kind == PAWN or captured is not None else self.halfmove + 1
+        if side == BLACK:
+            self.fullmove += 1
+        self.side = enemy
+
+    def pop(self):
+        'Takes back the last pushed move and returns it'
+
+        move, captured, self.castling, self.en_passant, self.halfmove, self.key = self.history.pop()
+
+        initial = move & 63
+        final = (move >> 6) & 63
+        promotion = (move >> 12) & 7
+        flag = move >> 15
+
+        enemy = self.side
+        side = self.side = enemy ^ 1
+        if side == BLACK:
+            self.fullmove -= 1
+
+        squares = self.squares
+        own_pieces = self.pieces[side]
+        kind = PAWN if promotion else squares[final] & 7
+
+        initial_bit, final_bit = 1 << initial, 1 << final
+        own_pieces[promotion or kind] ^= final_bit
+        own_pieces[kind] |= initial_bit
+        self.occupied[side] ^= initial_bit | final_bit
+        squares[final] = None
+        squares[initial] = (side << 3) | kind
+
+        if flag == CASTLING: # Moves the rook back to its corner
+            _, rook_initial, rook_final, _, _ = CASTLING_MOVES[final]
+            rook_bits = (1 << rook_initial) | (1 << rook_final)
+            own_pieces[ROOK] ^= rook_bits
+            self.occupied[side] ^= rook_bits
+            squares[rook_initial] = squares[rook_final]
+            squares[rook_final] = None
+
+        if captured is not None: # Puts the captured piece back
+            captured_square = final
+            if flag == EN_PASSANT:
+                captured_square = final + 8 if side == WHITE else final - 8
+            bit = 1 << captured_square
+            self.pieces[enemy][captured & 7] |= bit
+            self.occupied[enemy] |= bit
+            squares[captured_square] = captured
+
+        return move
@@ -0,0 +1,253 @@
+'''Simple Chess Notation Module
+
+FEN and PGN import and export. SAN moves are written and parsed against the legal move generator, and PGN is read game by game
+from any iterable of lines (such as an open file), so archives of any size are replayed in constant memory.
+
+Usage:
+    python notation.py games.pgn                     (replays and validates every game, reporting games/s and moves/s)
+    python notation.py games.pgn --output clean.pgn  (also writes every valid game back out)'''
+
+import argparse
+import re
+import sys
+import time
+
+from movegen import Position, WHITE, PAWN, IDENTIFIERS, EN_PASSANT, CASTLING, square_name
+
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*') # Game termination markers
+TAG_ROSTER = ('Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result') # Tags written first and always present in exported games
+
+SAN_PATTERN = re.compile(r'([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?') # Piece, disambiguation, destination and promotion of a SAN move
+TAG_PATTERN = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]') # Tag pair such as [White "Name"]
+TOKEN_PATTERN = re.compile(r'\{[^}]*\}|;[^\n]*|\(|\)|\$\d+|1-0|0-1|1/2-1/2|\*|\d+\.+|[^\s{}();$.]+') # Comments, variations, NAGs, results, move numbers and moves
+
+### SAN
+
+def _legal(position, move):
+    'Returns whether a pseudo-legal move of position leaves its own king out of check'
+
+    side = position.side
+    position.push(move)
+    legal = not position.is_attacked(position.king_square(side), side ^ 1)
+    position.pop()
+    return legal
+
+def move_to_san(position, move, legal_moves=None):
+    '''Returns the SAN of a legal move of position, such as Nbd7, exd6, e8=Q+ or O-O#
+
+    Takes the legal moves of position as third argument if they are already known'''
+
+    initial, final, promotion, flag = move & 63, (move >> 6) & 63, (move >> 12) & 7, move >> 15
+    kind = position.squares[initial] & 7
+
+    if flag == CASTLING:
+        text = 'O-O' if final % 8 == 6 else 'O-O-O'
+    else:
+        capture = position.squares[final] is not None or flag == EN_PASSANT
+        if kind == PAWN:
+            text = (square_name(initial)[0] + 'x' if capture else '') + square_name(final) + ('=' + IDENTIFIERS[promotion] if promotion else '')
+        else:
+            others = [other & 63 for other in (position.pseudo_legal_moves() if legal_moves is None else legal_moves) # Same piece type reaching the same square
+                      if (other >> 6) & 63 == final and other & 63 != initial and position.squares[other & 63] & 7 == kind and (legal_moves is not None or _legal(position, other))]
+            text = IDENTIFIERS[kind]
+            if others:
+                if all(other % 8 != initial % 8 for other in others): # Column tells the pieces apart
+                    text += square_name(initial)[0]
+                elif all(other // 8 != initial // 8 for other in others): # Row tells the pieces apart
+                    text += square_name(initial)[1]
+                else:
+                    text += square_name(initial)
+            text += ('x' if capture else '') + square_name(final)
+
+    position.push(move)
+    if position.in_check():
+        text += '+' if next(position.legal_moves_iter(), None) is not None else '#'
+    position.pop()
+    return text
+
+def parse_san(position, san, legal_moves=None):
+    '''Returns the move of position described by SAN (check marks and annotations such as !? are ignored)
+
+    Only the pseudo-legal moves matching the SAN are tested for legality unless the legal moves of position are given as third argument;
+    raises ValueError if the move is illegal, ambiguous or cannot be parsed'''
+
+    text = san.rstrip('+#!?')
+    moves = position.pseudo_legal_moves() if legal_moves is None else legal_moves
+
+    if text in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+        column = 6 if len(text) == 3 else 2
+        for move in moves:
+            if move >> 15 == CASTLING and ((move >> 6) & 63) % 8 == column and (legal_moves is not None or _legal(position, move)):
+                return move
+        raise ValueError(f'Illegal move {san}')
+
+    match = SAN_PATTERN.fullmatch(text)
+    if match is None:
+        raise ValueError(f'Invalid move {san!r}')
+
+    letter, column, row, destination, promotion = match.groups()
+    kind = IDENTIFIERS.index(letter or '')
+    final = (8 - int(destination[1]))*8 + 'abcdefgh'.index(destination[0])
+    promotion = IDENTIFIERS.index(promotion) if promotion else 0
+
+    candidates = [move for move in moves if (move >> 6) & 63 == final and move >> 15 != CASTLING and position.squares[move & 63] & 7 == kind and (move >> 12) & 7 == promotion
+                  and (column is None or (move & 63) % 8 == 'abcdefgh'.index(column)) and (row is None or (move & 63) // 8 == 8 - int(row))]
+    if legal_moves is None:
+        candidates = [move for move in candidates if _legal(position, move)]
+
+    if len(candidates) != 1:
+        raise ValueError(f'{"Ambiguous" if candidates else "Illegal"} move {san}')
+    return candidates[0]
+
+### PGN
+
+class PGNGame:
+    'Game read from or written to PGN: tag pairs, SAN moves and result'
+
+    __slots__ = ('headers', 'moves', 'result')
+
+    def __init__(self, headers=None, moves=None, result='*'):
+        self.headers = headers if headers is not None else {} # Tag pairs in the order they were read
+        self.moves = moves if moves is not None else [] # SAN of every move
+        self.result = result # One of RESULTS
+
+    def start(self):
+        'Returns the starting position of the game (the FEN tag if there is one)'
+
+        return Position.from_fen(self.headers['FEN']) if 'FEN' in self.headers else Position.initial()
+
+    def replay(self):
+        '''Plays every move of the game and returns the final position
+
+        Raises ValueError naming the first illegal, ambiguous or unreadable move'''
+
+        position = self.start()
+        for san in self.moves:
+            try:
+                position.push(parse_san(position, san))
+            except ValueError as error:
+                raise ValueError(f'{position.fullmove}{"." if position.side == WHITE else "..."} {error}') from None
+        return position
+
+def read_games(lines):
+    '''Yields a PGNGame for every game of an iterable of PGN lines, holding a single game in memory at a time
+
+    Comments, variations, NAGs and escape lines are skipped'''
+
+    headers, movetext = {}, []
+    for line in lines:
+        line = line.strip()
+        if line.startswith('['): # Tag pair; tags following movetext start a new game
+            if movetext:
+                yield _parse_game(headers, movetext)
+                headers, movetext = {}, []
+            match = TAG_PATTERN.match(line)
+            if match is not None:
+                headers[match.group(1)] = re.sub(r'\\(.)', r'\1', match.group(2))
+        elif line and not line.startswith('%'):
+            movetext.append(line)
+
+    if headers or movetext:
+        yield _parse_game(headers, movetext)
+
+def _parse_game(headers, movetext):
+    'Returns the PGNGame of tag pairs and movetext lines'
+
+    game = PGNGame(headers, result=headers.get('Result', '*'))
+    depth = 0 # Nesting of the variation being skipped
+    for token in TOKEN_PATTERN.findall('\n'.join(movetext)):
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth = max(depth - 1, 0)
+        elif depth or token[0] in '{;$' or token[0].isdigit() and token.endswith('.'): # Variation, comment, NAG or move number
+            continue
+        elif token in RESULTS:
+            game.result = token
+        else:
+            game.moves.append(token)
+    return game
+
+def format_game(game, width=80):
+    'Returns the PGN text of a PGNGame with the movetext wrapped to width columns'
+
+    headers = dict.fromkeys(TAG_ROSTER, '?')
+    headers.update(game.headers)
+    headers['Result'] = game.result
+    lines = [f'[{name} "' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"]' for name, value in headers.items()]
+    lines.append('')
+
+    start = game.start()
+    number, side = start.fullmove, start.side
+    tokens = []
+    for index, san in enumerate(game.moves):
+        if side == WHITE:
+            tokens.append(f'{number}. {san}')
+        else:
+            tokens.append(f'{number}... {san}' if index == 0 else san) # Game starting with a black move
+            number += 1 # Every black move completes a move
+        side ^= 1
+    tokens.append(game.result)
+
+    line = ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > width:
+            lines.append(line)
+            line = token
+        else:
+            line = f'{line} {token}' if line else token
+    lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+def write_games(games, output):
+    'Writes every PGNGame of an iterable to a text file one at a time and returns the number of games written'
+
+    count = 0
+    for game in games:
+        output.write(format_game(game) + '\n')
+        count += 1
+    return count
+
+### COMMAND LINE
+
+def validate(games, output=sys.stdout, valid=None):
+    '''Replays every game of an iterable of PGNGame, prints the invalid ones and the throughput and returns a tuple (games, moves, invalid)
+
+    Takes a text file as third argument to write every valid game to'''
+
+    count = moves = invalid = 0
+    start = time.perf_counter()
+    for game in games:
+        count += 1
+        try:
+            game.replay()
+        except ValueError as error:
+            invalid += 1
+            print(f'Game {count} ({game.headers.get("White", "?")} - {game.headers.get("Black", "?")}): {error}', file=output)
+            continue
+        moves += len(game.moves)
+        if valid is not None:
+            valid.write(format_game(game) + '\n')
+
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(f'{count} games ({invalid} invalid), {moves} moves in {elapsed:.3f}s: {count/elapsed:.1f} games/s, {moves/elapsed:.0f} moves/s', file=output)
+    return count, moves, invalid
+
+def main(arguments=None):
+    'Command line entry point; returns the process exit code (1 if any game is invalid)'
+
+    parser = argparse.ArgumentParser(description='Replays and validates every game of a PGN file game by game')
+    parser.add_argument('pgn', help='PGN file to read')
+    parser.add_argument('--output', help='file to write every valid game to')
+    arguments = parser.parse_args(arguments)
+
+    with open(arguments.pgn, encoding='utf-8', errors='replace') as source:
+        if arguments.output:
+            with open(arguments.output, 'w', encoding='utf-8') as output:
+                _, _, invalid = validate(read_games(source), valid=output)
+        else:
+            _, _, invalid = validate(read_games(source))
+    return 1 if invalid else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+'''Simple Chess Parallel Search Module
+
+Lazy SMP search: several processes search the same root position at staggered depths and share their results through a
+transposition table in shared memory. The result of the first search (run in the calling process) is played, the helper
+processes only fill the table with results it can reuse.
+
+Usage:
+    python parallel.py --workers 4 --time 2                 (searches the starting position with 4 processes)
+    python parallel.py --fen "<FEN>" --depth 6
+    python parallel.py --bench --time 2                     (speedup over a single process at fixed time, up to the core count)'''
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+from movegen import Position
+from zobrist import SharedTranspositionTable
+from engine import Search, SearchResult
+
+TABLE_SIZE = 1 << 20 # Slots of the shared transposition table (16 bytes each)
+
+def _helper(index, position, table_name, table_size, generation, stop, results):
+    'Helper process entry point; searches position until stop is set and puts (index, nodes) on results'
+
+    table = SharedTranspositionTable(table_size, table_name)
+    table.generation = generation
+    try:
+        result = Search(position, table).run(stop=stop, first_depth=1 + index % 2) # Half of the helpers search one iteration ahead
+        results.put((index, result.nodes))
+    finally:
+        table.close()
+
+def parallel_search(position, workers=None, time_limit=None, depth=None, info=None, table_size=TABLE_SIZE):
+    '''Returns the SearchResult of searching position with workers processes (the core count by default)
+
+    Nodes of the result are the nodes of every process combined, elapsed time is wall time'''
+
+    workers = workers or os.cpu_count() or 1
+    table = SharedTranspositionTable(table_size)
+    stop = multiprocessing.Event() # Stops the helpers once the main search has finished
+    results = multiprocessing.Queue()
+    start = time.perf_counter()
+
+    helpers = [multiprocessing.Process(target=_helper, args=(index, position, table.name, table_size, table.generation, stop, results), daemon=True) for index in range(1, workers)]
+    try:
+        for helper in helpers:
+            helper.start()
+
+        result = Search(position, table).run(time_limit, depth, info)
+        stop.set()
+
+        nodes = result.nodes
+        for helper in helpers:
+            helper.join()
+        while not results.empty(): # Nodes searched by every helper that finished normally
+            nodes += results.get()[1]
+    finally:
+        stop.set()
+        table.close()
+
+    return SearchResult(result.move, result.score, result.depth, nodes, time.perf_counter() - start)
+
+def benchmark(time_limit, max_workers=None, output=sys.stdout):
+    '''Searches the perft reference positions for a fixed time with 1, 2, 4 ... processes up to max_workers (the core count by default)
+    and prints the depth reached, combined nodes/s and speedup over a single process; returns a dictionary mapping worker counts to nodes/s'''
+
+    from perft import REFERENCE_POSITIONS
+
+    max_workers = max_workers or os.cpu_count() or 1
+    counts = sorted({min(1 << power, max_workers) for power in range(max_workers.bit_length() + 1)})
+    speeds = {}
+
+    for workers in counts:
+        total_nodes = total_time = total_depth = 0
+        for name, fen, _ in REFERENCE_POSITIONS:
+            result = parallel_search(Position.from_fen(fen), workers, time_limit)
+            total_nodes += result.nodes
+            total_time += result.elapsed
+            total_depth += result.depth
+
+        speeds[workers] = total_nodes / max(total_time, 1e-9)
+        print(f'{workers:>3} workers  average depth {total_depth/len(REFERENCE_POSITIONS):5.2f}  {speeds[workers]:>10.0f} nodes/s  speedup {speeds[workers]/speeds[1]:5.2f}x', file=output)
+
+    return speeds
+
+def main(arguments=None):
+    'Command line entry point; returns the process exit code'
+
+    parser = argparse.ArgumentParser(description='Searches a position with several processes sharing a transposition table')
+    parser.add_argument('--fen', help='position to search (defaults to the starting position)')
+    parser.add_argument('--workers', type=int, help='number of processes (defaults to the core count)')
+    parser.add_argument('--time', type=float, help='seconds to search (default 1 unless --depth is given)')
+    parser.add_argument('--depth', type=int, help='deepest iteration to search')
+    parser.add_argument('--bench', action='store_true', help='compare 1, 2, 4 ... processes on the perft reference positions at fixed time')
+    arguments = parser.parse_args(arguments)
+
+    time_limit = arguments.time if arguments.time is not None or arguments.depth is not None else 1.0
+
+    if arguments.bench:
+        benchmark(time_limit or 1.0, arguments.workers)
+        return 0
+
+    position = Position.from_fen(arguments.fen) if arguments.fen else Position.initial()
+    result = parallel_search(position, arguments.workers, time_limit, arguments.depth, info=print)
+    print(f'Combined: {result}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
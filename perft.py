@@ -0,0 +1,195 @@
+'''Simple Chess Perft Module
+
+Counts the leaf nodes of the move tree to a fixed depth to check the move generator for correctness and speed.
+
+Usage:
+    python perft.py --depth 4                  (starting position)
+    python perft.py --fen "<FEN>" --depth 3 --divide
+    python perft.py --suite --depth 3          (reference positions with known counts, with the move generator and the board rules)
+    python perft.py --depth 5 --hash           (reuses counts of transposed positions)
+    python perft.py --rules                    (time per call of the board movement rules for every piece type)'''
+
+import argparse
+import sys
+import time
+
+from board import Board, CODE_KINDS
+from movegen import Position, IDENTIFIERS, PAWN, PROMOTIONS, move_name
+from zobrist import TranspositionTable
+
+REFERENCE_POSITIONS = (
+        ('Starting position', 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1', (20, 400, 8902, 197281, 4865609)),
+        ('Kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', (48, 2039, 97862, 4085603)),
+        ('Position 3', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', (14, 191, 2812, 43238, 674624)),
+        ('Position 4', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1', (6, 264, 9467, 422333)),
+        ('Position 5', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8', (44, 1486, 62379, 2103487)),
+        ('Position 6', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10', (46, 2079, 89890, 3894594))
+        ) # Standard perft test positions as (name, FEN, leaf node counts from depth 1 upwards)
+
+def perft(position, depth, table=None):
+    '''Returns the number of leaf nodes of the legal move tree of position at the given depth
+
+    Subtree counts are reused from table (a TranspositionTable) when one is given'''
+
+    if depth == 0:
+        return 1
+
+    if table is not None and depth > 1:
+        entry = table.probe(position.key)
+        if entry is not None and entry[0] == depth: # Same position already counted to the same depth
+            return entry[1]
+
+    moves = position.legal_moves()
+    if depth == 1: # Leaf nodes only need to be counted, not played
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        position.push(move)
+        nodes += perft(position, depth - 1, table)
+        position.pop()
+
+    if table is not None:
+        table.store(position.key, depth, nodes)
+    return nodes
+
+def board_perft(board, depth, table=None):
+    '''Returns the number of leaf nodes of the legal move tree of a Board at the given depth, played with the rules of the game session
+    (legal_targets, make_move and unmake_move) instead of the move generator
+
+    Subtree counts are reused from table (a TranspositionTable) when one is given'''
+
+    if depth == 0:
+        return 1
+
+    if table is not None and depth > 1:
+        entry = table.probe(board.key)
+        if entry is not None and entry[0] == depth:
+            return entry[1]
+
+    nodes = 0
+    for initial, finals in board.legal_targets().items():
+        promoting = CODE_KINDS[board.state[initial]] == PAWN
+        for final in finals:
+            promotions = PROMOTIONS if promoting and final // 8 in (0, 7) else (None,) # Pawn reaching the last row is promoted to every piece type
+            if depth == 1:
+                nodes += len(promotions)
+                continue
+            for promotion in promotions:
+                board.make_move(initial, final, promotion)
+                nodes += board_perft(board, depth - 1, table)
+                board.unmake_move()
+
+    if table is not None:
+        table.store(board.key, depth, nodes)
+    return nodes
+
+def divide(position, depth, table=None):
+    'Returns a dictionary mapping the coordinate notation of every root move to its leaf node count at the given depth'
+
+    counts = {}
+    for move in position.legal_moves():
+        position.push(move)
+        counts[move_name(move)] = perft(position, depth - 1, table)
+        position.pop()
+    return counts
+
+def timed_perft(position, depth, table=None, counter=perft):
+    'Returns the leaf node count and the elapsed time in seconds; counter is perft for a Position or board_perft for a Board'
+
+    start = time.perf_counter()
+    nodes = counter(position, depth, table)
+    return nodes, time.perf_counter() - start
+
+def run_suite(depth, output=sys.stdout, hashed=False):
+    '''Runs every reference position up to depth (or its deepest known count) with the move generator and with the board rules
+    and prints the results
+
+    Returns True if every count matches its reference value'''
+
+    passed = True
+    total_nodes = total_time = 0
+
+    for name, fen, counts in REFERENCE_POSITIONS:
+        for current_depth in range(1, min(depth, len(counts)) + 1):
+            for rules, position, counter in (('movegen', Position.from_fen(fen), perft), ('board', Board.from_position(Position.from_fen(fen)), board_perft)):
+                nodes, elapsed = timed_perft(position, current_depth, TranspositionTable() if hashed else None, counter)
+                correct = nodes == counts[current_depth - 1]
+                passed = passed and correct
+                total_nodes += nodes
+                total_time += elapsed
+                print(f'{name:<18} {rules:<8} depth {current_depth}  {nodes:>10} nodes  {elapsed:8.3f}s  {nodes/max(elapsed, 1e-9):>10.0f} nodes/s  {"OK" if correct else f"FAIL (expected {counts[current_depth - 1]})"}', file=output)
+
+    print(f'Total {total_nodes} nodes in {total_time:.3f}s ({total_nodes/max(total_time, 1e-9):.0f} nodes/s)', file=output)
+    return passed
+
+def rules_benchmark(repeat=20, output=sys.stdout):
+    '''Times the movement rules of the board core (in_range followed by is_legal for reachable squares, which is how a dropped piece is
+    validated) from every square to every square for the pieces of the reference positions, and prints the time per call of every piece type
+
+    Returns a dictionary mapping piece types to nanoseconds per call'''
+
+    timings = {}
+    for kind, identifier in enumerate(IDENTIFIERS):
+        calls, elapsed = 0, 0.0
+        for _, fen, _ in REFERENCE_POSITIONS:
+            board = Board.from_position(Position.from_fen(fen))
+            for side in (0, 1):
+                board.state[64] = side # Pieces of both sides are validated
+                squares = [square for square in range(64) if CODE_KINDS[board.state[square]] == kind and board.state[square] >> 3 == side]
+                in_range, is_legal = board.in_range, board.is_legal
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    for initial in squares:
+                        for final in range(64):
+                            if initial != final:
+                                captured = in_range(initial, final)
+                                if captured is not None:
+                                    is_legal(initial, final, captured)
+                elapsed += time.perf_counter() - start
+                calls += repeat * len(squares) * 63
+
+        timings[kind] = elapsed / max(calls, 1) * 1e9
+        print(f'{identifier or "P"}  {calls:>8} calls  {timings[kind]:8.0f} ns/call', file=output)
+
+    return timings
+
+def main(arguments=None):
+    'Command line entry point; returns the process exit code'
+
+    parser = argparse.ArgumentParser(description='Counts leaf nodes of the legal move tree to check move generation correctness and speed')
+    parser.add_argument('--fen', help='position to search (defaults to the starting position)')
+    parser.add_argument('--depth', type=int, default=3, help='search depth (default 3)')
+    parser.add_argument('--divide', action='store_true', help='print the leaf node count of every root move')
+    parser.add_argument('--suite', action='store_true', help='run the reference positions with the move generator and the board rules and compare against their known counts')
+    parser.add_argument('--hash', action='store_true', help='reuse subtree counts of transposed positions through a transposition table')
+    parser.add_argument('--rules', action='store_true', help='time the board movement rules per piece type')
+    arguments = parser.parse_args(arguments)
+
+    if arguments.rules:
+        rules_benchmark()
+        return 0
+
+    if arguments.suite:
+        return 0 if run_suite(arguments.depth, hashed=arguments.hash) else 1
+
+    table = TranspositionTable() if arguments.hash else None
+
+    position = Position.from_fen(arguments.fen) if arguments.fen else Position.initial()
+
+    start = time.perf_counter()
+    if arguments.divide:
+        counts = divide(position, arguments.depth, table)
+        for name in sorted(counts):
+            print(f'{name}: {counts[name]}')
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(position, arguments.depth, table)
+    elapsed = time.perf_counter() - start
+
+    print(f'Nodes: {nodes}')
+    print(f'Time: {elapsed:.3f}s ({nodes/max(elapsed, 1e-9):.0f} nodes/s)')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
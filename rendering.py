@@ -0,0 +1,142 @@
+'''Simple Chess Rendering Module
+
+Drawing layer of the chess_board canvas. Highlight box and target markers are created once and moved with coords/itemconfig
+instead of being deleted and created again, and the motion events of a dragged piece are coalesced so that the canvas is
+redrawn at most once per display frame. Every drag is timed: handler time per motion event and delay until the frame showing it.'''
+
+import time
+import tkinter
+
+from global_vars import SQUARE_SIZE, TARGET_COLOUR
+
+FRAME_INTERVAL = 16 # Milliseconds between two redraws of a dragged piece (about 60 per second)
+
+class DragStats:
+    'Timing of a single drag: motion events handled, frames drawn, time spent in the handlers and delay until each event was drawn'
+
+    __slots__ = ('events', 'frames', 'handler_time', 'handler_max', 'delay_time', 'delay_max')
+
+    def __init__(self):
+        self.events = 0 # Motion events received
+        self.frames = 0 # Redraws of the dragged piece
+        self.handler_time = 0.0 # Seconds spent in the motion handlers
+        self.handler_max = 0.0 # Slowest motion handler in seconds
+        self.delay_time = 0.0 # Seconds between the first event of every frame and the frame being drawn
+        self.delay_max = 0.0 # Longest delay in seconds
+
+    def __str__(self):
+        return (f'Drag: {self.events} events, {self.frames} frames, handler {self.handler_time/max(self.events, 1)*1e6:.0f} us mean / {self.handler_max*1e6:.0f} us max, '
+                f'frame delay {self.delay_time/max(self.frames, 1)*1e3:.1f} ms mean / {self.delay_max*1e3:.1f} ms max')
+
+class BoardRenderer:
+    'Keeps the persistent canvas items of the board and redraws dragged pieces once per frame'
+
+    __slots__ = ('canvas', 'highlight', 'highlighted', 'markers', 'shown_markers', 'frame', 'pending', 'stats', 'report')
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.highlight = canvas.create_rectangle(0, 0, SQUARE_SIZE, SQUARE_SIZE, fill='', outline='blue', width=2, state=tkinter.HIDDEN) # Box around the square a dragged piece hovers on
+        self.highlighted = None # Square of the highlight box, None while it is hidden
+        self.markers = [] # Target marker items, created when more are needed than ever before and hidden when unused
+        self.shown_markers = 0 # Number of markers currently shown
+        self.frame = None # Id of the scheduled redraw, None if no redraw is scheduled
+        self.pending = None # Latest (item, x, y, square, received) of the dragged piece not drawn yet
+        self.stats = DragStats() # Timing of the current (or last) drag
+        self.report = None # Called with the DragStats of every finished drag, None to disable
+
+    ### HIGHLIGHT AND TARGETS
+
+    def show_highlight(self, square):
+        'Moves the highlight box to square and shows it'
+
+        self.highlighted = square
+        column, row = square % 8, square // 8
+        self.canvas.coords(self.highlight, SQUARE_SIZE*column, SQUARE_SIZE*row, SQUARE_SIZE*(column + 1), SQUARE_SIZE*(row + 1))
+        self.canvas.itemconfig(self.highlight, state=tkinter.NORMAL)
+
+    def show_targets(self, targets):
+        '''Marks the legal destinations of a piece: a dot on empty squares and a ring around pieces that would be captured
+
+        Takes a dictionary mapping destination squares to captured squares (as returned by ChessGame.legal_targets)'''
+
+        while len(self.markers) < len(targets):
+            self.markers.append(self.canvas.create_oval(0, 0, 0, 0, state=tkinter.HIDDEN))
+
+        for marker, (square, captured) in zip(self.markers, targets.items()):
+            column, row = square % 8, square // 8
+            if captured == square: # Ring around the piece that would be captured
+                self.canvas.coords(marker, SQUARE_SIZE*column + 3, SQUARE_SIZE*row + 3, SQUARE_SIZE*(column + 1) - 3, SQUARE_SIZE*(row + 1) - 3)
+                self.canvas.itemconfig(marker, fill='', outline=TARGET_COLOUR, width=3, state=tkinter.NORMAL)
+            else: # Dot in the middle of the square (en passant and castling included)
+                radius = SQUARE_SIZE / 8
+                self.canvas.coords(marker, SQUARE_SIZE*(column + 0.5) - radius, SQUARE_SIZE*(row + 0.5) - radius, SQUARE_SIZE*(column + 0.5) + radius, SQUARE_SIZE*(row + 0.5) + radius)
+                self.canvas.itemconfig(marker, fill=TARGET_COLOUR, outline='', width=0, state=tkinter.NORMAL)
+
+        for marker in self.markers[len(targets):self.shown_markers]: # Markers left over from the previous piece
+            self.canvas.itemconfig(marker, state=tkinter.HIDDEN)
+        self.shown_markers = len(targets)
+
+    def hide(self):
+        'Hides the highlight box and the target markers'
+
+        self.canvas.itemconfig(self.highlight, state=tkinter.HIDDEN)
+        self.highlighted = None
+        for marker in self.markers[:self.shown_markers]:
+            self.canvas.itemconfig(marker, state=tkinter.HIDDEN)
+        self.shown_markers = 0
+
+    ### DRAGGING
+
+    def start_drag(self, item, square, targets):
+        'Starts dragging the canvas item of a piece standing on square; takes its legal targets as third argument'
+
+        self.stats = DragStats()
+        self.show_targets(targets)
+        self.show_highlight(square)
+        self.canvas.tag_raise(item) # Dragged piece stays above the markers and the other pieces
+
+    def drag(self, item, x, y, square, received):
+        '''Records the latest position of a dragged item; the canvas is redrawn by the next frame
+
+        Takes the square under the pointer (None outside the board, where the highlight box stays put) and the perf_counter time the motion event was received'''
+
+        first = received if self.pending is None else self.pending[4] # Coalesced events keep the time of the first event of the frame for its delay
+        self.pending = (item, x, y, square, first)
+
+        if self.frame is None:
+            self.frame = self.canvas.after(FRAME_INTERVAL, self.__draw_frame)
+
+        elapsed = time.perf_counter() - received
+        self.stats.events += 1
+        self.stats.handler_time += elapsed
+        self.stats.handler_max = max(self.stats.handler_max, elapsed)
+
+    def __draw_frame(self):
+        'Draws the latest position of the dragged item'
+
+        self.frame = None
+        if self.pending is None:
+            return
+
+        item, x, y, square, received = self.pending
+        self.pending = None
+        self.canvas.coords(item, x, y)
+        if square is not None and square != self.highlighted: # Pointer has entered another square
+            self.show_highlight(square)
+
+        delay = time.perf_counter() - received
+        self.stats.frames += 1
+        self.stats.delay_time += delay
+        self.stats.delay_max = max(self.stats.delay_max, delay)
+
+    def end_drag(self):
+        'Drops the frame not drawn yet, hides the highlight box and markers and reports the timing of the drag'
+
+        if self.frame is not None:
+            self.canvas.after_cancel(self.frame)
+            self.frame = None
+        self.pending = None
+        self.hide()
+
+        if self.report is not None:
+            self.report(self.stats)
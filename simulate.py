@@ -0,0 +1,256 @@
+'''Simple Chess Simulation Module
+
+Plays games without a display in worker processes to stress the rules of the game session (the same Board rules the piece views
+use: castling, en passant and promotion through promote(), as chosen with the promotion buttons). Every game is played in lockstep
+on a movegen Position and checked after every ply: pieces, side, castling, en passant, halfmove clock, one king per side, the
+incremental key against a key computed from scratch, check and the legal moves themselves. Moves are taken back and replayed at
+random to check the history as well. Each game is seeded from its number, so any game can be played again on its own.
+
+A divergence is reported with the FEN of the position before the move that caused it and the move; if the error does not happen
+again when that single move is played from the FEN (it depends on the game history), the whole game is reported instead.
+
+Usage:
+    python simulate.py --games 1000                          (random games on every core, reporting games/s and moves/s)
+    python simulate.py --games 200 --engine 0.2 --depth 1    (a fifth of the moves chosen by the engine)
+    python simulate.py --games 1000 --log games.jsonl        (writes one JSON line per game)
+    python simulate.py --replay 1234                         (plays the game of seed 1234 again in this process)'''
+
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from board import HALFMOVE, CODE_KINDS, CODE_SIDES
+from game import ChessGame
+from movegen import Position, WHITE, BLACK, KING, EN_PASSANT, CASTLING, move_name
+import engine
+
+MAX_PLIES = 400 # Games still going on after this many plies are stopped
+UNDO_RATE = 0.05 # Chance of taking every move back and replaying it from the history
+CHUNK_SIZE = 8 # Games sent to a worker process at a time
+COUNTERS = ('castling', 'en_passant', 'promotions', 'captures', 'undos') # Rules exercised by every game, added up in the report
+
+### CHECKS
+
+def state_error(game, position):
+    'Returns a description of the first difference between the board of a game and a movegen Position, or None if they agree'
+
+    board = game.board
+    for square in range(64):
+        code = board.state[square]
+        if (CODE_SIDES[code] << 3 | CODE_KINDS[code] if code else None) != position.squares[square]:
+            return f'Square {square} holds {code} on the board'
+
+    if (board.side, board.castling, board.en_passant) != (position.side, position.castling, position.en_passant):
+        return f'Side, castling or en passant square differ: {(board.side, board.castling, board.en_passant)}'
+    if board.state[HALFMOVE] != min(position.halfmove, 255):
+        return f'Halfmove clock is {board.state[HALFMOVE]} instead of {position.halfmove}'
+
+    for side in (WHITE, BLACK):
+        if position.squares.count(side << 3 | KING) != 1:
+            return f'Side {side} has {position.squares.count(side << 3 | KING)} kings'
+        if board.king_squares[side] != position.king_square(side):
+            return f'King of side {side} is tracked on square {board.king_squares[side]}'
+        if sum(1 for code in position.squares if code is not None and code >> 3 == side) > 16:
+            return f'Side {side} has more than 16 pieces'
+
+    if board.key != board.compute_key():
+        return 'Incremental key differs from the key computed from scratch'
+    if board.key != position.key:
+        return 'Key differs from the movegen key'
+    if board.in_check(board.side) != position.in_check():
+        return 'Check differs'
+    return None
+
+def moves_error(game, moves):
+    'Returns a description of the difference between the legal targets of a game and the legal movegen moves, or None if they agree'
+
+    targets = game.legal_targets() if game.result is None else game.board.legal_targets() # Game session offers no move once the game has ended
+    targets = {(initial, final) for initial, finals in targets.items() for final in finals}
+    expected = {(move & 63, (move >> 6) & 63) for move in moves}
+    if targets != expected:
+        extra = ' '.join(move_name(initial | final << 6) for initial, final in sorted(targets - expected))
+        missing = ' '.join(move_name(initial | final << 6) for initial, final in sorted(expected - targets))
+        return f'Legal moves differ (extra: {extra or "none"}, missing: {missing or "none"})'
+    return None
+
+def outcome_error(game, moves):
+    'Returns a description of a game result that contradicts the legal movegen moves, or None'
+
+    ended = game.result is not None and ('checkmate' in game.result or 'stalemate' in game.result)
+    if ended != (not moves):
+        return f'Result is {game.result!r} with {len(moves)} legal moves'
+    return None
+
+def _play(game, move, promote_later):
+    'Plays a movegen move on a game, promoting through promote() (as the promotion buttons do) if promote_later is True'
+
+    initial, final, promotion = move & 63, (move >> 6) & 63, (move >> 12) & 7
+    if promotion and promote_later:
+        game.play(initial, final)
+        if game.pending_promotion != final:
+            raise ValueError('Pawn is not waiting for promotion')
+        game.promote(promotion)
+    else:
+        game.play(initial, final, promotion or None)
+
+def reproduces(fen, move):
+    'Returns the error of playing a single move from a FEN on a new game, or None if both rule sets agree on the position reached'
+
+    game, position = ChessGame(), Position.from_fen(fen)
+    game.load_fen(fen)
+    try:
+        _play(game, move, False)
+    except ValueError as error:
+        return str(error)
+    position.push(move)
+    moves = position.legal_moves()
+    return state_error(game, position) or moves_error(game, moves) or outcome_error(game, moves)
+
+### GAMES
+
+def play_game(seed, engine_rate=0.0, depth=1, max_plies=MAX_PLIES):
+    '''Plays the random game of a seed and returns its record: a dictionary of plain values written as a line of the log
+
+    Takes the chance of every move being chosen by an engine search to depth instead of at random'''
+
+    rng = random.Random(seed)
+    game, position = ChessGame(), Position.initial()
+    game.new_game()
+    played = [] # Movegen moves of the game
+    record = dict(seed=seed, plies=0, result=None, **dict.fromkeys(COUNTERS, 0))
+    start = time.perf_counter()
+
+    moves = position.legal_moves()
+    error = state_error(game, position) or moves_error(game, moves)
+    while error is None and game.result is None and len(played) < max_plies:
+        if engine_rate and rng.random() < engine_rate:
+            move = engine.search(Position.from_fen(position.to_fen()), depth=depth).move # Searched on a copy, the position keeps its history
+        else:
+            move = rng.choice(moves)
+
+        flag = move >> 15
+        record['castling'] += flag == CASTLING
+        record['en_passant'] += flag == EN_PASSANT
+        record['promotions'] += (move >> 12) & 7 != 0
+        record['captures'] += position.squares[(move >> 6) & 63] is not None or flag == EN_PASSANT
+
+        try:
+            _play(game, move, rng.random() < 0.5) # Half of the promotions wait for promote()
+        except ValueError as rejected:
+            error = f'Move {move_name(move)} is rejected: {rejected}'
+        position.push(move)
+        played.append(move)
+
+        moves = position.legal_moves()
+        error = error or state_error(game, position) or moves_error(game, moves) or outcome_error(game, moves)
+
+        if error is None and rng.random() < UNDO_RATE: # Takes the move back and replays it from the history
+            snapshot, result = game.board.snapshot(), game.result
+            game.take_back()
+            position.pop()
+            error = state_error(game, position) or moves_error(game, position.legal_moves())
+            position.push(move)
+            game.redo()
+            if error is None and (game.board.snapshot(), game.result) != (snapshot, result):
+                error = 'Position or result differ after the move has been taken back and replayed'
+            record['undos'] += 1
+
+    record['plies'], record['result'] = len(played), game.result
+    record['ms'] = round((time.perf_counter() - start)*1e3, 1)
+    if error is not None:
+        record['error'] = error
+        _locate(record, position, played)
+    return record
+
+def _locate(record, position, played):
+    'Adds the smallest reproduction of the error of a game to its record: a FEN and one move, or the whole game'
+
+    if played:
+        move = played[-1]
+        position.pop()
+        fen = position.to_fen()
+        if reproduces(fen, move) is not None:
+            record['fen'], record['move'] = fen, move_name(move)
+            return
+    record['fen'], record['moves'] = Position.initial().to_fen(), ' '.join(move_name(move) for move in played)
+
+def simulate(games, workers=None, seed=0, engine_rate=0.0, depth=1, max_plies=MAX_PLIES, log=None, output=sys.stdout):
+    '''Plays games of seeds seed to seed + games - 1 in worker processes, writes their records to log (a text file, one JSON line each)
+    and prints the throughput, the rules exercised and every divergence; returns a dictionary of the totals
+
+    Games are played in this process if workers is 1'''
+
+    player = functools.partial(play_game, engine_rate=engine_rate, depth=depth, max_plies=max_plies)
+    seeds = range(seed, seed + games)
+    totals = dict(games=0, plies=0, **dict.fromkeys(COUNTERS, 0))
+    results, divergences = {}, []
+    start = time.perf_counter()
+
+    pool = multiprocessing.Pool(workers) if workers != 1 else None
+    try:
+        records = pool.imap_unordered(player, seeds, CHUNK_SIZE) if pool is not None else map(player, seeds)
+        for record in records:
+            totals['games'] += 1
+            totals['plies'] += record['plies']
+            for name in COUNTERS:
+                totals[name] += record[name]
+            results[record['result']] = results.get(record['result'], 0) + 1
+            if 'error' in record:
+                divergences.append(record)
+            if log is not None:
+                log.write(json.dumps(record, separators=(',', ':')) + '\n')
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    processes = workers or os.cpu_count() or 1
+    totals['seconds'] = round(elapsed, 3)
+    totals['divergences'] = len(divergences)
+    print(f'{totals["games"]} games, {totals["plies"]} moves in {elapsed:.2f}s with {processes} process{"es" if processes > 1 else ""}: '
+          f'{totals["games"]/elapsed:.1f} games/s, {totals["plies"]/elapsed:.0f} moves/s', file=output)
+    print('Rules: ' + ', '.join(f'{totals[name]} {name.replace("_", " ")}' for name in COUNTERS), file=output)
+    for result, count in sorted(results.items(), key=lambda item: -item[1]):
+        print(f'{count:>8}  {result or "Stopped after the longest game"}', file=output)
+
+    for record in divergences:
+        print(f'Seed {record["seed"]}: {record["error"]}', file=output)
+        print(f'    FEN {record["fen"]}  ' + (f'move {record["move"]}' if 'move' in record else f'moves {record["moves"]}'), file=output)
+    return totals
+
+### COMMAND LINE
+
+def main(arguments=None):
+    'Command line entry point; returns the process exit code (1 if any game diverged)'
+
+    parser = argparse.ArgumentParser(description='Plays random games in worker processes and checks the board rules against the move generator after every ply')
+    parser.add_argument('--games', type=int, default=100, help='number of games (default 100)')
+    parser.add_argument('--workers', type=int, help='number of processes (defaults to the core count, 1 plays in this process)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game, the others follow (default 0)')
+    parser.add_argument('--engine', type=float, default=0.0, help='chance of a move being chosen by the engine (default 0)')
+    parser.add_argument('--depth', type=int, default=1, help='depth of the engine searches (default 1)')
+    parser.add_argument('--plies', type=int, default=MAX_PLIES, help=f'longest game in plies (default {MAX_PLIES})')
+    parser.add_argument('--log', help='JSONL file to write the record of every game to')
+    parser.add_argument('--replay', type=int, metavar='SEED', help='plays the game of one seed in this process and prints its record')
+    arguments = parser.parse_args(arguments)
+
+    if arguments.replay is not None:
+        record = play_game(arguments.replay, arguments.engine, arguments.depth, arguments.plies)
+        print(json.dumps(record, indent=2))
+        return 1 if 'error' in record else 0
+
+    if arguments.log:
+        with open(arguments.log, 'w', encoding='utf-8') as log:
+            totals = simulate(arguments.games, arguments.workers, arguments.seed, arguments.engine, arguments.depth, arguments.plies, log)
+    else:
+        totals = simulate(arguments.games, arguments.workers, arguments.seed, arguments.engine, arguments.depth, arguments.plies)
+    return 1 if totals['divergences'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+'''Simple Chess Game Session Tests
+
+Headless tests of the game session, run with: python -m unittest test_game'''
+
+import unittest
+
+from game import ChessGame, INITIAL_FEN
+
+PROMOTION_FEN = '4k3/P7/8/8/8/8/8/4K3 w - - 0 1' # White pawn on a7 (square 8) one step from promotion on a8 (square 0)
+
+class PendingPromotionTest(unittest.TestCase):
+    'A pawn waiting for promotion is dropped cleanly by every way of leaving the position'
+
+    def setUp(self):
+        self.game = ChessGame()
+        self.game.load_fen(PROMOTION_FEN)
+        self.game.play(8, 0) # Waits for promote()
+        self.assertEqual(self.game.pending_promotion, 0)
+
+    def test_take_back(self):
+        self.game.take_back()
+        self.assertIsNone(self.game.pending_promotion)
+        self.assertEqual(self.game.fen(), PROMOTION_FEN)
+
+        self.game.play(60, 59) # Next move is written without the cancelled pawn move
+        self.assertEqual(self.game.moves, ['Kd1'])
+
+    def test_load_fen(self):
+        self.game.load_fen(INITIAL_FEN)
+        self.assertIsNone(self.game.pending_promotion)
+        self.assertEqual(self.game.fen(), INITIAL_FEN)
+
+    def test_invalid_promotion(self):
+        self.game.take_back()
+        with self.assertRaises(ValueError):
+            self.game.play(8, 0, 5) # King
+        self.assertIsNone(self.game.pending_promotion)
+        self.assertEqual(self.game.fen(), PROMOTION_FEN)
+        self.assertEqual(len(self.game.history), 0)
+
+    def test_new_game(self):
+        self.game.new_game()
+        self.game.play(52, 36)
+        self.assertEqual(self.game.moves, ['e4'])
+
+class InvalidFENTest(unittest.TestCase):
+    'A FEN that cannot be read leaves the current game untouched'
+
+    def test_rejected(self):
+        game = ChessGame()
+        game.new_game()
+        game.play(52, 36) # e4
+        fen = game.fen()
+        for invalid in ('rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e9 0 1', # Off the board
+                        'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq a0 0 1',
+                        'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e6 0 1', # Wrong rank for the side to move
+                        'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq d3 0 1', # No pawn pushed past d3
+                        'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - -3 1'):
+            with self.assertRaises(ValueError):
+                game.load_fen(invalid)
+            self.assertEqual(game.fen(), fen)
+            self.assertEqual(game.moves, ['e4'])
+
+        game.load_fen('rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1')
+        self.assertEqual(game.board.en_passant, 44)
+
+class RepetitionTest(unittest.TestCase):
+    'Positions differing only by an en passant square no pawn can capture on are repetitions'
+
+    def test_uncapturable_en_passant(self):
+        game = ChessGame()
+        game.new_game()
+        game.play(52, 36) # e4, no black pawn can take on e3
+        for initial, final in ((6, 21), (62, 45), (21, 6), (45, 62)) * 2: # Nf6 Nf3 Ng8 Ng1, twice
+            self.assertIsNone(game.result)
+            game.play(initial, final)
+        self.assertEqual(game.board.repetition_count(), 3)
+        self.assertEqual(game.result, 'Draw by threefold repetition')
+        self.assertEqual(game.board.key, game.board.compute_key())
+        self.assertEqual(game.board.key, game.board.to_position().key)
+
+class JumpTest(unittest.TestCase):
+    'Jumping to a ply of the history, as the reset button and the move list do'
+
+    def setUp(self):
+        self.game = ChessGame()
+        self.game.load_fen(PROMOTION_FEN)
+        self.plies = []
+        self.game.subscribe('ply', self.plies.append)
+        self.game.play(60, 59) # Kd1
+        self.game.play(4, 3) # Kd8
+
+    def test_jump(self):
+        self.game.jump(0)
+        self.assertEqual(self.game.fen(), PROMOTION_FEN)
+        self.game.jump(2)
+        self.assertEqual(self.game.moves, ['Kd1', 'Kd8'])
+        self.assertEqual(self.plies, [1, 2, 0, 2])
+
+    def test_reset_with_pending_promotion(self):
+        self.game.play(8, 0)
+        self.game.jump(0)
+        self.assertIsNone(self.game.pending_promotion)
+        self.assertEqual(self.game.fen(), PROMOTION_FEN)
+        self.assertEqual(self.plies[-1], 0)
+        self.assertEqual(len(self.game.history), 2) # Moves can still be replayed
+
+    def test_jump_with_pending_promotion(self):
+        self.game.play(8, 0)
+        self.game.jump(1)
+        self.assertIsNone(self.game.pending_promotion)
+        self.assertEqual(self.game.moves, ['Kd1'])
+        self.assertEqual(self.plies[-1], 1)
+
+        self.game.redo()
+        self.game.play(8, 0, 4) # a8=Q is written after the replayed moves
+        self.assertEqual(self.game.moves, ['Kd1', 'Kd8', 'a8=Q+'])
+
+if __name__ == '__main__':
+    unittest.main()
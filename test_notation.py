@@ -0,0 +1,29 @@
+'''Simple Chess Notation Tests
+
+Headless tests of FEN and PGN import and export, run with: python -m unittest test_notation'''
+
+import unittest
+
+from game import ChessGame
+from notation import read_games
+
+BLACK_TO_MOVE_FEN = '4k3/4p3/8/8/8/8/4P3/4K3 b - - 0 12' # Kings and pawns, black to move on move 12
+
+class PGNRoundTripTest(unittest.TestCase):
+    'Games written by the game session are read back and replayed to the same position'
+
+    def test_black_to_move(self):
+        game = ChessGame()
+        game.load_fen(BLACK_TO_MOVE_FEN)
+        for initial, final in ((4, 3), (60, 59), (3, 4), (59, 60)): # Kd8 Kd1 Ke8 Ke1
+            game.play(initial, final)
+
+        text = game.pgn()
+        self.assertIn('12... Kd8 13. Kd1 Ke8 14. Ke1', text)
+
+        read = next(read_games(text.splitlines()))
+        self.assertEqual(read.moves, ['Kd8', 'Kd1', 'Ke8', 'Ke1'])
+        self.assertEqual(read.replay().to_fen().split()[:4], game.fen().split()[:4])
+
+if __name__ == '__main__':
+    unittest.main()
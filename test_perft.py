@@ -0,0 +1,22 @@
+'''Simple Chess Perft Tests
+
+Headless tests of the move generator and the board rules against the reference perft counts, run with: python -m unittest test_perft'''
+
+import io
+import unittest
+
+from perft import run_suite
+
+class SuiteTest(unittest.TestCase):
+    'Both rule sets count the known leaf nodes of every reference position, including castling, en passant and promotions'
+
+    def test_suite(self):
+        output = io.StringIO()
+        self.assertTrue(run_suite(3, output), output.getvalue())
+
+    def test_hashed_suite(self):
+        output = io.StringIO()
+        self.assertTrue(run_suite(2, output, hashed=True), output.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,201 @@
+'''Simple Chess Zobrist Hashing Module
+
+Random 64 bit keys identifying positions, a bounded transposition table and a repetition counter.
+Side and piece type indexes match movegen (white 0, black 1; pawn, knight, bishop, rook, queen, king)'''
+
+import random
+
+_random = random.Random(20210110) # Fixed seed so that every process builds the same keys
+
+PIECE_KEYS = [[[_random.getrandbits(64) for square in range(64)] for kind in range(6)] for side in range(2)] # Key of every piece, indexed by side, piece type and square
+SIDE_KEY = _random.getrandbits(64) # Included when black is to move
+CASTLING_KEYS = [_random.getrandbits(64) for rights in range(16)] # Key of every combination of castling right bits
+EN_PASSANT_KEYS = [_random.getrandbits(64) for column in range(8)] # Key of the column of the en passant square
+
+CASTLING_KEYS[0] = 0 # No castling rights leaves the key unchanged
+
+def position_key(squares, side, castling, en_passant):
+    '''Returns the key of a position computed from scratch
+
+    Takes list of 64 piece codes ((side << 3) | piece type, or None), side to move, castling right bits and en passant square (or None)'''
+
+    key = SIDE_KEY if side else 0
+    for square, code in enumerate(squares):
+        if code is not None:
+            key ^= PIECE_KEYS[code >> 3][code & 7][square]
+    key ^= CASTLING_KEYS[castling]
+    return key ^ en_passant_key(squares, en_passant, (0, 8)) # Codes of a white and a black movegen pawn (movegen.PAWN_CODES)
+
+def en_passant_key(squares, en_passant, pawns):
+    '''Returns the key of an en passant square, or 0 if no pawn can capture on it
+
+    Takes indexable piece codes of the 64 squares, en passant square (or None) and the codes of a white and a black pawn
+    Only a pawn standing next to the pushed pawn can capture it, otherwise the position is the same as without an en passant square'''
+
+    if en_passant is None:
+        return 0
+    if en_passant < 32: # Black pawn pushed past the square, white to move
+        pushed, pawn = en_passant + 8, pawns[0]
+    else:
+        pushed, pawn = en_passant - 8, pawns[1]
+    column = en_passant % 8
+    if column > 0 and squares[pushed - 1] == pawn or column < 7 and squares[pushed + 1] == pawn:
+        return EN_PASSANT_KEYS[column]
+    return 0
+
+class TranspositionTable:
+    '''Bounded table of results indexed by position key
+
+    Every key maps to a single slot. A stored result replaces the one in its slot if the slot is empty, holds the same position,
+    was stored during an older search (generation) or was searched less deeply'''
+
+    __slots__ = ('size', 'slots', 'generation', 'hits', 'misses')
+
+    def __init__(self, size=1 << 18):
+        self.size = size # Number of slots
+        self.slots = [None] * size # Stores (key, depth, generation, value) tuples
+        self.generation = 0 # Incremented by new_search so that results of older searches get replaced first
+        self.hits = 0
+        self.misses = 0
+
+    def probe(self, key):
+        'Returns a tuple (depth, value) stored for key, or None if the position is not in the table'
+
+        entry = self.slots[key % self.size]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry[1], entry[3]
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, value):
+        'Stores value searched to depth for key, following the replacement policy'
+
+        index = key % self.size
+        entry = self.slots[index]
+        if entry is None or entry[0] == key or entry[2] != self.generation or depth >= entry[1]:
+            self.slots[index] = (key, depth, self.generation, value)
+
+    def new_search(self):
+        'Marks every stored result as belonging to an older search'
+
+        self.generation += 1
+
+    def clear(self):
+        'Removes every stored result'
+
+        self.slots = [None] * self.size
+        self.generation = self.hits = self.misses = 0
+
+class SharedTranspositionTable:
+    '''Transposition table of engine search results kept in a multiprocessing.shared_memory buffer, so that several processes search with one table
+
+    Every slot holds two 64 bit words: the key XORed with the packed result, and the packed result. A slot torn by two processes writing
+    at once fails the key check instead of returning a wrong result, so no lock is needed. Values are (score, bound, move) tuples'''
+
+    __slots__ = ('size', 'memory', 'words', 'owner', 'generation', 'hits', 'misses')
+
+    def __init__(self, size=1 << 18, name=None):
+        '''Creates a new table of size slots, or attaches to the table created by another process if name is given
+
+        Takes number of slots and name of an existing table (see name)'''
+
+        from multiprocessing import shared_memory # Imported here so that importing the rules stays fast
+
+        self.size = size # Number of slots
+        self.owner = name is None # Process that created the table removes it when it is closed
+        self.memory = shared_memory.SharedMemory(name=name, create=self.owner, size=size * 16)
+        self.words = self.memory.buf.cast('Q') # Two words for every slot
+        self.generation = 0 # Incremented by new_search so that results of older searches get replaced first
+        self.hits = 0 # Counted by each process separately
+        self.misses = 0
+
+        if self.owner:
+            self.words[:size * 2] = memoryview(bytes(size * 16)).cast('Q') # Shared memory is not guaranteed to start empty
+
+    @property
+    def name(self):
+        'Name other processes attach to the table with'
+
+        return self.memory.name
+
+    def probe(self, key):
+        'Returns a tuple (depth, (score, bound, move)) stored for key, or None if the position is not in the table'
+
+        index = (key % self.size) * 2
+        data = self.words[index + 1]
+        if data and self.words[index] ^ data == key:
+            self.hits += 1
+            move = data & 0x3FFFF
+            return (data >> 20) & 0xFF, ((data >> 36) - (1 << 19), (data >> 18) & 3, move - 1 if move else None)
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, value):
+        'Stores value searched to depth for key, following the same replacement policy as TranspositionTable'
+
+        index = (key % self.size) * 2
+        old = self.words[index + 1]
+        if not old or self.words[index] ^ old == key or (old >> 28) & 0xFF != self.generation & 0xFF or depth >= (old >> 20) & 0xFF:
+            score, bound, move = value
+            data = (move + 1 if move is not None else 0) | (bound << 18) | (min(depth, 255) << 20) | ((self.generation & 0xFF) << 28) | ((score + (1 << 19)) << 36)
+            self.words[index] = key ^ data
+            self.words[index + 1] = data
+
+    def new_search(self):
+        'Marks every stored result as belonging to an older search'
+
+        self.generation += 1
+
+    def clear(self):
+        'Removes every stored result'
+
+        self.words[:self.size * 2] = memoryview(bytes(self.size * 16)).cast('Q')
+        self.generation = self.hits = self.misses = 0
+
+    def close(self):
+        'Detaches the process from the table; the creating process also removes it'
+
+        self.words.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+class RepetitionCounter:
+    'Counts how many times every position key has occurred in a game'
+
+    __slots__ = ('counts', 'keys')
+
+    def __init__(self):
+        self.counts = {} # Maps every key to the number of times it has occurred
+        self.keys = [] # Keys in the order they occurred, so they can be taken back
+
+    def push(self, key):
+        'Records an occurrence of key and returns how many times it has occurred'
+
+        count = self.counts.get(key, 0) + 1
+        self.counts[key] = count
+        self.keys.append(key)
+        return count
+
+    def pop(self):
+        'Takes back the last recorded key and returns it'
+
+        key = self.keys.pop()
+        count = self.counts[key] - 1
+        if count:
+            self.counts[key] = count
+        else:
+            del self.counts[key]
+        return key
+
+    def count(self, key):
+        'Returns how many times key has occurred'
+
+        return self.counts.get(key, 0)
+
+    def clear(self):
+        'Forgets every recorded key'
+
+        self.counts = {}
+        self.keys = []